@@ -15,6 +15,8 @@ from datetime import datetime
 
 from .state import app_state, StreamingMode, GeneratorType
 
+TWO_PI = 2.0 * math.pi
+
 class EegPacket:
     """EEG packet structure matching Unity schema"""
     
@@ -64,6 +66,12 @@ class SignalGenerator:
     def __init__(self):
         self.start_time = time.time()
         self.last_spike_time = 0
+        
+        # Sine phases are accumulated per packet and kept in [0, 2*pi), so the
+        # argument to sin() stays small however long the session runs
+        self._last_time = self.start_time
+        self._phase = 0.0
+        self._lr_phase = 0.0
         self.spike_duration = 1.0
         self.spike_active = False
         
@@ -73,6 +81,12 @@ class SignalGenerator:
         current_time = time.time()
         elapsed = current_time - self.start_time
         
+        # Advance sine phases by this packet's time step
+        dt = current_time - self._last_time
+        self._last_time = current_time
+        self._phase = math.fmod(self._phase + config.frequency * dt, TWO_PI)
+        self._lr_phase = math.fmod(self._lr_phase + 0.7 * config.frequency * dt, TWO_PI)
+        
         # Check for random spikes
         if (current_time - self.last_spike_time) > (1.0 / config.spike_rate) and random.random() < 0.01:
             self.last_spike_time = current_time
@@ -113,12 +127,12 @@ class SignalGenerator:
     
     def _generate_sine_wave(self, elapsed: float, config) -> EegPacket:
         """Generate sinusoidal EEG values"""
-        base_freq = config.frequency
+        phase = self._phase
         
-        alpha = config.bias + config.amplitude * math.sin(base_freq * elapsed + config.phase_offset['alpha'])
-        beta = config.bias + config.amplitude * math.sin(base_freq * elapsed + config.phase_offset['beta'])
-        theta = config.bias + config.amplitude * math.sin(base_freq * elapsed + config.phase_offset['theta'])
-        delta = config.bias + config.amplitude * math.sin(base_freq * elapsed + config.phase_offset['delta'])
+        alpha = config.bias + config.amplitude * math.sin(phase + config.phase_offset['alpha'])
+        beta = config.bias + config.amplitude * math.sin(phase + config.phase_offset['beta'])
+        theta = config.bias + config.amplitude * math.sin(phase + config.phase_offset['theta'])
+        delta = config.bias + config.amplitude * math.sin(phase + config.phase_offset['delta'])
         
         # Add noise
         alpha += random.gauss(0, config.noise_level)
@@ -128,8 +142,9 @@ class SignalGenerator:
         
         # Calculate derived values
         arousal = (alpha + beta) * 0.5 + random.gauss(0, config.noise_level * 0.5)
-        left = config.bias + 0.1 * math.sin(base_freq * elapsed * 0.7)
-        right = config.bias - 0.1 * math.sin(base_freq * elapsed * 0.7)
+        lr = math.sin(self._lr_phase)
+        left = config.bias + 0.1 * lr
+        right = config.bias - 0.1 * lr
         front = (alpha + theta) * 0.5
         back = (beta + delta) * 0.5
         
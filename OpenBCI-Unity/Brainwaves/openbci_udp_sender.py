@@ -46,6 +46,8 @@ class OpenBCIUDPSender:
         
         # Data buffer for band power calculation
         self.buffer_size = 256  # samples
+        # Hamming window for band power, built once (float32 is plenty)
+        self.hamming_window = np.hamming(self.buffer_size).astype(np.float32)
         self.sampling_rate = 250  # Hz (Cyton default)
         self.num_channels = 8
         
@@ -96,8 +98,9 @@ class OpenBCIUDPSender:
         if len(data) < self.buffer_size:
             return 0.0
         
-        # Apply Hamming window
-        windowed = data * np.hamming(len(data))
+        # Apply Hamming window (channel buffers are always buffer_size long),
+        # casting the detrended float64 samples to float32 in the same pass
+        windowed = np.multiply(data, self.hamming_window, dtype=np.float32)
         
         # Calculate FFT
         fft_vals = np.abs(np.fft.rfft(windowed))
@@ -7,9 +7,10 @@ Sends selected brainwave band data to Unity via UDP
 import socket
 import time
 import numpy as np
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import threading
 import json
+from functools import lru_cache
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
 from brainflow.data_filter import DataFilter, FilterTypes, WindowOperations
 
@@ -36,6 +37,21 @@ BAND_RANGES = {
     "gamma": (30, 50)
 }
 
+# Simulated accelerometer: bias + gain * sin(rate * t + phase) per axis
+# (the y axis phase of pi/2 turns its sine into a cosine)
+ACCEL_RATES = np.array([0.5, 0.3, 0.1])
+ACCEL_PHASES = np.array([0.0, np.pi / 2, 0.0])
+ACCEL_GAINS = np.array([0.3, 0.2, 0.1])
+ACCEL_BIAS = np.array([0.0, 0.0, 0.9])
+
+# Pre-encoded JSON bodies for the control routes
+STREAMING_BODY = {True: '{"streaming": true}', False: '{"streaming": false}'}
+SET_BAND_BODY = {band: json.dumps({"success": True, "band": band}) for band in BAND_RANGES}
+
+def json_response(body):
+    """Wrap a pre-encoded JSON body in a response"""
+    return Response(body, mimetype='application/json')
+
 def setup_udp():
     """Setup UDP socket for Unity communication"""
     global udp_socket
@@ -63,6 +79,14 @@ def send_accelerometer_data(x, y, z):
         except Exception as e:
             print(f"Accelerometer UDP send error: {e}")
 
+@lru_cache(maxsize=None)
+def band_slice(sampling_rate, nfft, band_range):
+    """Slice of Welch PSD bins that fall inside band_range (inclusive)"""
+    freqs = np.fft.rfftfreq(nfft, 1.0 / sampling_rate)
+    lo_idx = int(np.searchsorted(freqs, band_range[0]))
+    hi_idx = int(np.searchsorted(freqs, band_range[1], side='right'))
+    return slice(lo_idx, hi_idx)
+
 def calculate_band_power(data, sampling_rate, band_range):
     """Calculate power in specific frequency band"""
     try:
@@ -72,19 +96,17 @@ def calculate_band_power(data, sampling_rate, band_range):
             print("No EEG channels found")
             return 0.0
             
-        # Use first EEG channel
+        # Use the last 256 samples of the first EEG channel. A row of the board
+        # array is already contiguous, so this is a view rather than a copy;
+        # the in-place bandpass below only touches this tick's board array.
         eeg_channel = eeg_channels[0]
-        eeg_data = data[eeg_channel].copy()
+        eeg_data = np.ascontiguousarray(data[eeg_channel, -256:])
         
         print(f"Data shape: {data.shape}, EEG channel: {eeg_channel}, samples: {len(eeg_data)}")
         
         if len(eeg_data) < 256:  # Need enough samples for good FFT
             print(f"Not enough samples: {len(eeg_data)}")
             return 0.0
-        
-        # Take last 256 samples for analysis
-        if len(eeg_data) > 256:
-            eeg_data = eeg_data[-256:]
             
         # Apply bandpass filter
         DataFilter.perform_bandpass(eeg_data, sampling_rate, 
@@ -97,13 +119,9 @@ def calculate_band_power(data, sampling_rate, band_range):
         psd = DataFilter.get_psd_welch(eeg_data, nfft, noverlap, sampling_rate, 
                                       WindowOperations.HANNING.value)
         
-        # Get frequency bands
-        freqs = psd[1]
-        powers = psd[0]
-        
-        # Find indices for our frequency band
-        band_mask = (freqs >= band_range[0]) & (freqs <= band_range[1])
-        band_power = np.mean(powers[band_mask]) if np.any(band_mask) else 0.0
+        # Average the PSD bins inside our frequency band
+        band_powers = psd[0][band_slice(sampling_rate, nfft, band_range)]
+        band_power = band_powers.mean() if band_powers.size else 0.0
         
         # Normalize to 0-1 range (synthetic data has known ranges)
         normalized_power = min(max(band_power / 100.0, 0.0), 1.0)
@@ -135,8 +153,8 @@ def brainflow_thread():
         while is_streaming:
             time.sleep(0.1)  # 10Hz update rate
             
-            # Get recent data
-            data = board.get_board_data()
+            # Get the most recent analysis window
+            data = board.get_current_board_data(256)
             if data.shape[1] > 0:
                 sampling_rate = BoardShim.get_sampling_rate(board_id)
                 band_range = BAND_RANGES[current_band]
@@ -149,10 +167,8 @@ def brainflow_thread():
                 send_to_unity(current_band, current_power)
                 
                 # Simulate accelerometer data (replace with real sensor)
-                fake_accel_x = np.sin(time.time() * 0.5) * 0.3
-                fake_accel_y = np.cos(time.time() * 0.3) * 0.2  
-                fake_accel_z = 0.9 + np.sin(time.time() * 0.1) * 0.1
-                send_accelerometer_data(fake_accel_x, fake_accel_y, fake_accel_z)
+                fake_accel = ACCEL_BIAS + ACCEL_GAINS * np.sin(time.time() * ACCEL_RATES + ACCEL_PHASES)
+                send_accelerometer_data(*fake_accel)
                 
     except Exception as e:
         print(f"BrainFlow thread error: {e}")
@@ -282,9 +298,9 @@ def set_band():
     current_band = data.get('band', 'alpha')
     print(f"Band changed to: {current_band}")
     
-    # Send test data when band changes
-    send_to_unity(current_band, 0.3)
-    
+    # Unity picks up the new band from the stream on the next tick
+    if current_band in SET_BAND_BODY:
+        return json_response(SET_BAND_BODY[current_band])
     return jsonify({"success": True, "band": current_band})
 
 @app.route('/start_streaming', methods=['POST'])
@@ -293,16 +309,13 @@ def start_streaming():
     if not is_streaming:
         threading.Thread(target=brainflow_thread, daemon=True).start()
     
-    # Send test message immediately
-    send_to_unity(current_band, 0.5)
-    
-    return jsonify({"streaming": is_streaming})
+    return json_response(STREAMING_BODY[is_streaming])
 
 @app.route('/stop_streaming', methods=['POST']) 
 def stop_streaming():
     global is_streaming
     is_streaming = False
-    return jsonify({"streaming": is_streaming})
+    return json_response(STREAMING_BODY[False])
 
 @app.route('/status')
 def status():
@@ -22,6 +22,7 @@ HARMONICS = 2                 # 1 = fundamental only, 2 = add 2nd harmonic
 USE_CHANNELS = None           # None = use all EEG channels, or list like [0,1,2,7,8,9]
 SNR_NEIGHBOR_BW = 1.0         # Hz - sidebands for noise floor calculation
 SNR_EXCLUDE_BW = 0.3          # Hz - exclude ±0.3 Hz around peak from noise floor
+PROCESS_SCORING_MIN_TARGETS = 4  # Score in a worker process from this many targets on (None = never)
 
 # Decision parameters
 VOTE_HOLD_MS = 500            # ms - must hold the top class this long before select
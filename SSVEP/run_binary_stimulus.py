@@ -1,6 +1,6 @@
 """Binary choice visual stimulus for SSVEP BCI - Optimized for 2 options"""
 
-import numpy as np
+import math
 import time
 from psychopy import visual, core, event
 import sys
@@ -21,7 +21,8 @@ class BinaryChoiceStimulus:
     def __init__(self, freq_left: float = 10.0, freq_right: float = 15.0,
                  labels: tuple = ("Option A", "Option B"),
                  window_size: tuple = (1024, 600),
-                 fullscreen: bool = False):
+                 fullscreen: bool = False,
+                 waveform: str = 'sine'):
         """
         Initialize binary choice stimulus
         
@@ -31,6 +32,7 @@ class BinaryChoiceStimulus:
             labels: Text labels for the two options
             window_size: Window dimensions (width, height)
             fullscreen: Use fullscreen mode
+            waveform: 'sine' for sinusoidal opacity, 'square' for on/off toggling
         """
         self.freq_left = freq_left
         self.freq_right = freq_right
@@ -38,6 +40,7 @@ class BinaryChoiceStimulus:
         self.labels = labels
         self.window_size = window_size
         self.fullscreen = fullscreen
+        self.waveform = waveform
         
         # Visual parameters
         self.box_size = 250  # Larger boxes for easier focusing
@@ -55,8 +58,11 @@ class BinaryChoiceStimulus:
         
         # Animation state
         self.frame_rate = 60.0
-        self.frame_counters = {freq: 0.0 for freq in self.frequencies}
-        self.frames_per_cycle = {freq: self.frame_rate / freq for freq in self.frequencies}
+        self.frames_per_cycle = [self.frame_rate / freq for freq in self.frequencies]  # [left, right]
+        self.frame = 0
+        self._cnt_L = 0
+        self._cnt_R = 0
+        self._cache_sine_steps()
         
         # State
         self.is_running = False
@@ -82,8 +88,8 @@ class BinaryChoiceStimulus:
                 self.frame_rate = actual_rate
                 logger.info(f"Monitor refresh rate: {self.frame_rate:.1f} Hz")
                 # Recalculate frames per cycle
-                for freq in self.frequencies:
-                    self.frames_per_cycle[freq] = self.frame_rate / freq
+                self.frames_per_cycle = [self.frame_rate / freq for freq in self.frequencies]
+                self._cache_sine_steps()
             
             # Create left option box
             self.left_box = visual.Rect(
@@ -179,6 +185,16 @@ class BinaryChoiceStimulus:
                 font='Arial'
             )
             
+            # Capture all text that never changes into one image so each
+            # frame issues a single draw for it
+            self._static_bg = visual.BufferImageStim(
+                self.win,
+                stim=[self.left_label, self.right_label,
+                      self.left_freq_text, self.right_freq_text,
+                      self.instruction_text]
+            )
+            self.win.clearBuffer()
+            
             logger.info("Visual stimulus setup complete")
             return True
             
@@ -186,45 +202,51 @@ class BinaryChoiceStimulus:
             logger.error(f"Failed to setup window: {e}")
             return False
     
+    def _half_cycle(self, freq: float) -> int:
+        """Whole frames per half cycle of a square-wave flicker"""
+        return max(1, int(round(self.frame_rate / (2 * freq))))
+    
+    def _cache_sine_steps(self):
+        """Precompute per-frame phase steps, counter wrap points and square half periods"""
+        fpc_L, fpc_R = self.frames_per_cycle
+        self._k_L = 2 * math.pi / fpc_L
+        self._k_R = 2 * math.pi / fpc_R
+        # Counters wrap on the first whole frame at or past one cycle
+        self._wrap_L = math.ceil(fpc_L)
+        self._wrap_R = math.ceil(fpc_R)
+        self._half_L = self._half_cycle(self.freq_left)
+        self._half_R = self._half_cycle(self.freq_right)
+    
     def update_flicker(self):
         """Update flicker state for both boxes"""
-        # Update frame counters
-        for freq in self.frequencies:
-            self.frame_counters[freq] += 1.0
-            if self.frame_counters[freq] >= self.frames_per_cycle[freq]:
-                self.frame_counters[freq] = 0.0
-        
-        # Calculate opacities
-        left_phase = 2 * np.pi * self.frame_counters[self.freq_left] / self.frames_per_cycle[self.freq_left]
-        right_phase = 2 * np.pi * self.frame_counters[self.freq_right] / self.frames_per_cycle[self.freq_right]
+        if self.waveform == 'square':
+            # On/off toggle from the frame index - integer ops only
+            self.frame += 1
+            self.left_box.opacity = float((self.frame // self._half_L) & 1)
+            self.right_box.opacity = float((self.frame // self._half_R) & 1)
+            return
         
-        left_opacity = (np.sin(left_phase) + 1) / 2
-        right_opacity = (np.sin(right_phase) + 1) / 2
+        # Update frame counters
+        self._cnt_L = (self._cnt_L + 1) % self._wrap_L
+        self._cnt_R = (self._cnt_R + 1) % self._wrap_R
         
         # Apply opacities
-        self.left_box.opacity = left_opacity
-        self.right_box.opacity = right_opacity
+        self.left_box.opacity = 0.5 * (math.sin(self._cnt_L * self._k_L) + 1.0)
+        self.right_box.opacity = 0.5 * (math.sin(self._cnt_R * self._k_R) + 1.0)
     
     def draw_frame(self):
         """Draw a single frame"""
         # Update flicker
         self.update_flicker()
         
+        # Draw labels, frequency indicators and instruction (captured once
+        # as a full-window image, so it goes first and the boxes on top)
+        self._static_bg.draw()
+        
         # Draw boxes
         self.left_box.draw()
         self.right_box.draw()
         
-        # Draw labels
-        self.left_label.draw()
-        self.right_label.draw()
-        
-        # Draw frequency indicators
-        self.left_freq_text.draw()
-        self.right_freq_text.draw()
-        
-        # Draw instruction
-        self.instruction_text.draw()
-        
         # Draw selection indicator if something is selected
         if self.selected:
             if self.selected == 'left':
@@ -295,7 +317,7 @@ class BinaryChoiceStimulus:
             
             while self.is_running:
                 # Check for quit
-                keys = event.getKeys()
+                keys = event.getKeys(keyList=['escape', 'space'])
                 if 'escape' in keys:
                     break
                 
@@ -309,12 +331,9 @@ class BinaryChoiceStimulus:
                     else:
                         self.set_selection('left')
                 
-                # Draw frame
+                # Draw frame - win.flip() blocks on vsync and paces the loop
                 self.draw_frame()
                 
-                # Control frame rate
-                core.wait(0.001)
-                
         except Exception as e:
             logger.error(f"Error in main loop: {e}")
         
@@ -346,6 +365,8 @@ def main():
                        help='Label for right option')
     parser.add_argument('--fullscreen', action='store_true',
                        help='Run in fullscreen mode')
+    parser.add_argument('--square', action='store_true',
+                       help='Use square-wave (on/off) flicker instead of sinusoidal')
     
     args = parser.parse_args()
     
@@ -354,7 +375,8 @@ def main():
         freq_left=args.left_freq,
         freq_right=args.right_freq,
         labels=(args.left_label, args.right_label),
-        fullscreen=args.fullscreen
+        fullscreen=args.fullscreen,
+        waveform='square' if args.square else 'sine'
     )
     
     stimulus.run()
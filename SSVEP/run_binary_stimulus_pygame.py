@@ -1,12 +1,18 @@
 """Binary choice visual stimulus for SSVEP BCI using Pygame"""
 
 import pygame
-import numpy as np
-import time
+import math
 import sys
 import os
 import logging
 
+# Hardware-accelerated renderer (pygame 2, optional)
+try:
+    from pygame._sdl2.video import Window, Renderer, Texture
+    SDL2_RENDERER_AVAILABLE = True
+except ImportError:
+    SDL2_RENDERER_AVAILABLE = False
+
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
@@ -21,7 +27,9 @@ class BinaryChoiceStimulusPygame:
     def __init__(self, freq_left: float = 10.0, freq_right: float = 15.0,
                  labels: tuple = ("LEFT", "RIGHT"),
                  window_size: tuple = (1024, 600),
-                 fullscreen: bool = False):
+                 fullscreen: bool = False,
+                 waveform: str = 'sine',
+                 use_gpu: bool = False):
         """
         Initialize binary choice stimulus
         
@@ -31,6 +39,8 @@ class BinaryChoiceStimulusPygame:
             labels: Text labels for the two options
             window_size: Window dimensions (width, height)
             fullscreen: Use fullscreen mode
+            waveform: 'sine' for sinusoidal grayscale, 'square' for on/off toggling
+            use_gpu: Render through the SDL2 hardware renderer instead of software blits
         """
         self.freq_left = freq_left
         self.freq_right = freq_right
@@ -38,6 +48,7 @@ class BinaryChoiceStimulusPygame:
         self.labels = labels
         self.window_size = window_size
         self.fullscreen = fullscreen
+        self.waveform = waveform
         
         # Visual parameters
         self.box_size = 250  # Larger boxes for easier focusing
@@ -52,14 +63,33 @@ class BinaryChoiceStimulusPygame:
         # Initialize Pygame
         pygame.init()
         
+        if use_gpu and not SDL2_RENDERER_AVAILABLE:
+            logger.warning("pygame._sdl2 not available, falling back to software rendering")
+            use_gpu = False
+        self.use_gpu = use_gpu
+        
         # Set up display
-        if fullscreen:
-            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        self.renderer = None
+        if self.use_gpu:
+            self.screen = None
+            self.window = Window("SSVEP Binary Choice", size=window_size,
+                                 fullscreen_desktop=fullscreen)
+            self.window_size = self.window.size
+            self.renderer = Renderer(self.window, vsync=True)
+            self.renderer.draw_color = (*self.bg_color, 255)
+        elif fullscreen:
+            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN | pygame.DOUBLEBUF)
             self.window_size = self.screen.get_size()
         else:
-            self.screen = pygame.display.set_mode(window_size)
+            self.screen = pygame.display.set_mode(window_size, pygame.DOUBLEBUF)
+        
+        if self.screen is not None:
+            pygame.display.set_caption("SSVEP Binary Choice")
         
-        pygame.display.set_caption("SSVEP Binary Choice")
+        # Keep SDL from queueing event types the loop never reads
+        self._wanted_events = [pygame.QUIT, pygame.KEYDOWN, pygame.VIDEOEXPOSE]
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(self._wanted_events)
         
         # Font for labels
         self.font = pygame.font.Font(None, 36)
@@ -77,35 +107,88 @@ class BinaryChoiceStimulusPygame:
         self.right_pos = (center_x + self.separation // 2 - self.box_size // 2,
                          center_y - self.box_size // 2)
         
-        # Timing variables
-        self.start_time = None
-        self.left_phase = 0
-        self.right_phase = 0
+        # Flicker timing - intensities for one full repeating epoch are
+        # precomputed and indexed by the displayed frame number. Frequencies
+        # without a common epoch get their levels from each frame's phase.
+        self.refresh_rate = 60
+        self.idle_rate = 10  # Loop rate while stimulation is paused
+        if self.waveform == 'square':
+            # Square waves toggle every half period, so the flicker runs at
+            # the nearest frequency with a whole number of frames per half cycle
+            self._half_left = self._half_period(self.freq_left)
+            self._half_right = self._half_period(self.freq_right)
+            effective = [self.refresh_rate / (2 * h) for h in (self._half_left, self._half_right)]
+            for requested, actual in zip(self.frequencies, effective):
+                if abs(requested - actual) > 1e-9:
+                    logger.warning(f"Square wave at {requested} Hz runs at {actual:.2f} Hz "
+                                   f"on a {self.refresh_rate} Hz display")
+            self.epoch_frames = self._epoch_length(effective, self.refresh_rate)
+        else:
+            self._half_left = self._half_right = None
+            self.epoch_frames = self._epoch_length(self.frequencies, self.refresh_rate)
+        
+        # Frozen (v, v, v) color per gray level, so a frame allocates nothing
+        self._gray = [(v, v, v) for v in range(256)]
+        self._frame = 0
+        
+        if self.epoch_frames is None:
+            # A truncated epoch would jump both phases every time it wraps
+            logger.warning(f"Flicker at {self.frequencies} Hz never repeats exactly on a "
+                           f"{self.refresh_rate} Hz display; computing levels per frame")
+            self._left_colors = self._right_colors = None
+        else:
+            self._left_colors = [self._gray[self._frame_level(n, self.freq_left, self._half_left)]
+                                 for n in range(self.epoch_frames)]
+            self._right_colors = [self._gray[self._frame_level(n, self.freq_right, self._half_right)]
+                                  for n in range(self.epoch_frames)]
+        
+        # Box interiors are filled directly each frame; the borders live on the HUD
+        self.border_width = 3
+        self._left_rect = pygame.Rect(*self.left_pos, self.box_size, self.box_size).inflate(
+            -2 * self.border_width, -2 * self.border_width)
+        self._right_rect = pygame.Rect(*self.right_pos, self.box_size, self.box_size).inflate(
+            -2 * self.border_width, -2 * self.border_width)
+        
+        # Only the box interiors change from frame to frame
+        self._dirty = [self._left_rect, self._right_rect]
+        
+        # Static text and borders are rendered once and blitted as a single surface
+        self._hud = self._build_hud()
+        
+        # Feedback has one surface per possible selection
+        self._fb_surfs = {None: None,
+                          0: self._render_feedback_text(0),
+                          1: self._render_feedback_text(1)}
+        
+        if self.screen is not None:
+            # Opaque background with the HUD composited in, restored on full redraws
+            self._bg = pygame.Surface(self.window_size).convert()
+            self._bg.fill(self.bg_color)
+            self._bg.blit(self._hud, (0, 0))
+        else:
+            # Boxes are one white texture tinted per frame via color modulation
+            white = pygame.Surface((1, 1))
+            white.fill(self.white)
+            self._box_tex = Texture.from_surface(self.renderer, white)
+            self._hud_tex = Texture.from_surface(self.renderer, self._hud)
+            self._fb_textures = {None: None}
+            for selection in (0, 1):
+                surface, rect = self._fb_surfs[selection]
+                self._fb_textures[selection] = (Texture.from_surface(self.renderer, surface), rect)
+            self._feedback_tex = None
         
         # Control flags
         self.running = False
         self.test_mode = False
         self.current_selection = None
         
-        logger.info(f"Initialized binary stimulus - Left: {freq_left}Hz, Right: {freq_right}Hz")
+        logger.info(f"Initialized binary stimulus - Left: {freq_left}Hz, Right: {freq_right}Hz "
+                    f"({self.waveform})")
     
-    def draw_box(self, position, color, label):
-        """Draw a flickering box with label"""
-        # Draw box
-        pygame.draw.rect(self.screen, color, 
-                        (position[0], position[1], self.box_size, self.box_size))
-        pygame.draw.rect(self.screen, self.black, 
-                        (position[0], position[1], self.box_size, self.box_size), 3)
-        
-        # Draw label above box
-        text = self.font.render(label, True, self.white)
-        text_rect = text.get_rect()
-        text_rect.centerx = position[0] + self.box_size // 2
-        text_rect.bottom = position[1] - 20
-        self.screen.blit(text, text_rect)
-    
-    def draw_instructions(self):
-        """Draw instruction text"""
+    def _build_hud(self):
+        """Pre-render static text (instructions and box labels) onto one surface"""
+        hud = pygame.Surface(self.window_size, pygame.SRCALPHA)
+        
         instructions = [
             "SSVEP Binary Choice",
             f"Left: {self.freq_left} Hz | Right: {self.freq_right} Hz",
@@ -121,106 +204,207 @@ class BinaryChoiceStimulusPygame:
             text_rect = text.get_rect()
             text_rect.centerx = self.window_size[0] // 2
             text_rect.top = y_offset
-            self.screen.blit(text, text_rect)
+            hud.blit(text, text_rect)
             y_offset += 30
+        
+        # Box borders and labels above boxes
+        for position, label in ((self.left_pos, self.labels[0]),
+                                (self.right_pos, self.labels[1])):
+            pygame.draw.rect(hud, self.black,
+                             (position[0], position[1], self.box_size, self.box_size),
+                             self.border_width)
+            
+            text = self.font.render(label, True, self.white)
+            text_rect = text.get_rect()
+            text_rect.centerx = position[0] + self.box_size // 2
+            text_rect.bottom = position[1] - 20
+            hud.blit(text, text_rect)
+        
+        if self.screen is None:
+            return hud
+        return hud.convert_alpha()
+    
+    def _render_feedback_text(self, selection):
+        """Render the feedback line for one selection, returns (surface, rect)"""
+        if selection == 0:
+            text = f"Selection: {self.labels[0]} ({self.freq_left} Hz)"
+            color = self.red
+        else:
+            text = f"Selection: {self.labels[1]} ({self.freq_right} Hz)"
+            color = self.red
+        
+        feedback = self.font.render(text, True, color)
+        feedback_rect = feedback.get_rect()
+        feedback_rect.centerx = self.window_size[0] // 2
+        feedback_rect.bottom = self.window_size[1] - 50
+        return feedback, feedback_rect
     
     def draw_feedback(self):
         """Draw feedback for current selection"""
-        if self.current_selection is not None:
-            if self.current_selection == 0:
-                text = f"Selection: {self.labels[0]} ({self.freq_left} Hz)"
-                color = self.red
-            else:
-                text = f"Selection: {self.labels[1]} ({self.freq_right} Hz)"
-                color = self.red
-            
-            feedback = self.font.render(text, True, color)
-            feedback_rect = feedback.get_rect()
-            feedback_rect.centerx = self.window_size[0] // 2
-            feedback_rect.bottom = self.window_size[1] - 50
-            self.screen.blit(feedback, feedback_rect)
+        feedback = self._fb_surfs[self.current_selection]
+        if feedback is not None:
+            self.screen.blit(*feedback)
     
-    def update_flicker(self):
-        """Update flicker states based on frequencies"""
-        if self.start_time is None:
-            self.start_time = time.time()
+    def present_gpu(self, left_color, right_color, state_changed):
+        """Draw one frame through the hardware renderer"""
+        renderer = self.renderer
         
-        current_time = time.time()
-        elapsed = current_time - self.start_time
+        if state_changed:
+            # Pick the feedback texture only when it can have changed
+            self._feedback_tex = self._fb_textures[self.current_selection] if self.test_mode else None
         
-        # Calculate phases
-        self.left_phase = np.sin(2 * np.pi * self.freq_left * elapsed)
-        self.right_phase = np.sin(2 * np.pi * self.freq_right * elapsed)
+        renderer.clear()
         
-        # Convert to colors (sine wave to grayscale)
-        left_intensity = int((self.left_phase + 1) * 127.5)
-        right_intensity = int((self.right_phase + 1) * 127.5)
+        # Color-modulate the white texture for each box interior
+        self._box_tex.color = left_color
+        self._box_tex.draw(dstrect=self._left_rect)
+        self._box_tex.color = right_color
+        self._box_tex.draw(dstrect=self._right_rect)
+        
+        self._hud_tex.draw()
+        if self._feedback_tex is not None:
+            texture, rect = self._feedback_tex
+            texture.draw(dstrect=rect)
+        
+        renderer.present()
+    
+    @staticmethod
+    def _epoch_length(frequencies, refresh_rate, max_frames=3600):
+        """Smallest frame count after which every flicker repeats exactly (None if over max_frames)"""
+        for n in range(1, max_frames + 1):
+            cycles = [n * f / refresh_rate for f in frequencies]
+            if all(abs(c - round(c)) < 1e-9 for c in cycles):
+                return n
+        return None
+    
+    def _half_period(self, freq):
+        """Frames per half cycle of a square-wave flicker"""
+        return max(1, int(round(self.refresh_rate / (2 * freq))))
+    
+    def reset_flicker(self):
+        """Restart both flicker phases from zero"""
+        self._frame = 0
+    
+    def update_flicker(self):
+        """Look up grayscale colors for the current frame"""
+        frame = self._frame
+        self._frame += 1
         
-        left_color = (left_intensity, left_intensity, left_intensity)
-        right_color = (right_intensity, right_intensity, right_intensity)
+        if self._left_colors is None:
+            # No common epoch to tabulate; work out this frame's levels directly
+            return self._gray[self._frame_level(frame, self.freq_left, self._half_left)], \
+                self._gray[self._frame_level(frame, self.freq_right, self._half_right)]
         
-        return left_color, right_color
+        i = frame % self.epoch_frames
+        return self._left_colors[i], self._right_colors[i]
+    
+    def _frame_level(self, frame, freq, half_period):
+        """Gray level (0-255) of one flicker at a frame number"""
+        if self.waveform == 'square':
+            return 255 * ((frame // half_period) & 1)
+        # Phase taken modulo one cycle, so it stays exact however long the run
+        phase = (frame * freq / self.refresh_rate) % 1.0
+        return int((math.sin(2 * math.pi * phase) + 1) * 127.5)
     
     def run(self):
         """Main stimulus loop"""
         self.running = True
         stimulating = False
+        full_redraw = True
         
         logger.info("Starting stimulus presentation")
         logger.info("Press SPACE to start/stop, ESC to exit")
         
+        # Bind everything the frame loop touches to locals
+        peek = pygame.event.peek
+        wanted_events = self._wanted_events
+        update_flicker = self.update_flicker
+        white = self.white
+        gpu = self.renderer is not None
+        present_gpu = self.present_gpu
+        screen = self.screen
+        if not gpu:
+            fill = screen.fill
+            blit = screen.blit
+            bg = self._bg
+        left_rect, right_rect = self._left_rect, self._right_rect
+        dirty = self._dirty
+        update = pygame.display.update
+        flip = pygame.display.flip
+        tick = self.clock.tick
+        refresh_rate = self.refresh_rate
+        idle_rate = self.idle_rate
+        
         while self.running:
-            # Handle events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
+            # Handle events - only touch the queue when something is pending
+            if peek(wanted_events):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
                         self.running = False
-                    elif event.key == pygame.K_SPACE:
-                        stimulating = not stimulating
-                        if stimulating:
-                            logger.info("Stimulation started")
-                            self.start_time = time.time()
-                        else:
-                            logger.info("Stimulation stopped")
-                    elif event.key == pygame.K_t:
-                        self.test_mode = not self.test_mode
-                        logger.info(f"Test mode: {self.test_mode}")
-                    elif event.key == pygame.K_1:
-                        self.current_selection = 0
-                        logger.info(f"Manual selection: {self.labels[0]}")
-                    elif event.key == pygame.K_2:
-                        self.current_selection = 1
-                        logger.info(f"Manual selection: {self.labels[1]}")
-            
-            # Clear screen
-            self.screen.fill(self.bg_color)
+                    elif event.type == pygame.VIDEOEXPOSE:
+                        # Window was uncovered - repaint everything
+                        full_redraw = True
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
+                            self.running = False
+                        elif event.key == pygame.K_SPACE:
+                            stimulating = not stimulating
+                            full_redraw = True
+                            if stimulating:
+                                logger.info("Stimulation started")
+                                self.reset_flicker()
+                            else:
+                                logger.info("Stimulation stopped")
+                        elif event.key == pygame.K_t:
+                            self.test_mode = not self.test_mode
+                            full_redraw = True
+                            logger.info(f"Test mode: {self.test_mode}")
+                        elif event.key == pygame.K_1:
+                            self.current_selection = 0
+                            full_redraw = True
+                            logger.info(f"Manual selection: {self.labels[0]}")
+                        elif event.key == pygame.K_2:
+                            self.current_selection = 1
+                            full_redraw = True
+                            logger.info(f"Manual selection: {self.labels[1]}")
             
-            # Draw instructions
-            self.draw_instructions()
+            if not (stimulating or full_redraw):
+                # Nothing changes while paused - just keep polling events slowly
+                tick(idle_rate)
+                continue
             
             if stimulating:
                 # Update flicker
-                left_color, right_color = self.update_flicker()
-                
-                # Draw boxes
-                self.draw_box(self.left_pos, left_color, self.labels[0])
-                self.draw_box(self.right_pos, right_color, self.labels[1])
+                left_color, right_color = update_flicker()
             else:
-                # Draw static boxes
-                self.draw_box(self.left_pos, self.white, self.labels[0])
-                self.draw_box(self.right_pos, self.white, self.labels[1])
-            
-            # Draw feedback if in test mode
-            if self.test_mode:
-                self.draw_feedback()
+                # Static boxes
+                left_color = right_color = white
             
-            # Update display
-            pygame.display.flip()
+            if gpu:
+                present_gpu(left_color, right_color, full_redraw)
+                full_redraw = False
+            else:
+                if full_redraw:
+                    # Restore background with instructions, labels and box borders
+                    blit(bg, (0, 0))
+                    
+                    # Draw feedback if in test mode
+                    if self.test_mode:
+                        self.draw_feedback()
+                
+                # Fill box interiors
+                fill(left_color, left_rect)
+                fill(right_color, right_rect)
+                
+                # Update display - only the box interiors unless the layout changed
+                if full_redraw:
+                    flip()
+                    full_redraw = False
+                else:
+                    update(dirty)
             
             # Control frame rate (60 FPS)
-            self.clock.tick(60)
+            tick(refresh_rate)
         
         # Cleanup
         pygame.quit()
@@ -240,6 +424,10 @@ def main():
                        help='Run in fullscreen mode')
     parser.add_argument('--test', action='store_true',
                        help='Enable test mode with manual selection')
+    parser.add_argument('--square', action='store_true',
+                       help='Use square-wave (on/off) flicker instead of sinusoidal')
+    parser.add_argument('--gpu', action='store_true',
+                       help='Render with the SDL2 hardware renderer (pygame 2)')
     
     args = parser.parse_args()
     
@@ -247,7 +435,9 @@ def main():
     stimulus = BinaryChoiceStimulusPygame(
         freq_left=args.freq_left,
         freq_right=args.freq_right,
-        fullscreen=args.fullscreen
+        fullscreen=args.fullscreen,
+        waveform='square' if args.square else 'sine',
+        use_gpu=args.gpu
     )
     
     if args.test:
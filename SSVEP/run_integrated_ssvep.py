@@ -5,21 +5,48 @@ import numpy as np
 import pygame
 import time
 import threading
-import queue
 from pylsl import StreamInlet, resolve_streams
-from scipy import signal
-from scipy.signal import welch
-from collections import deque
+from scipy import fft as sp_fft
 import sys
 import os
 import logging
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Optional multithreaded FFT backend for scipy.fft
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft
+    pyfftw.interfaces.cache.enable()
+    # Plans are cached and built ahead of the first tick (see connect_lsl),
+    # so a measured plan costs nothing at detection time
+    pyfftw.config.PLANNER_EFFORT = 'FFTW_MEASURE'
+    sp_fft.set_global_backend(pyfftw.interfaces.scipy_fft)
+    PYFFTW_AVAILABLE = True
+except ImportError:
+    PYFFTW_AVAILABLE = False
+
+# Optional GPU PSD for high channel counts
+try:
+    import cupy as cp
+    CUPY_AVAILABLE = True
+except ImportError:
+    CUPY_AVAILABLE = False
 
 # Add local src directory
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
-from utils import StableVoteFilter
+from utils import StableVoteFilter, TimeSeriesBuffer
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+# Configure logging (SSVEP_LOG_LEVEL=WARNING silences per-step INFO output)
+LOG_LEVEL = os.environ.get('SSVEP_LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO),
+                    format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # SSVEP parameters
@@ -27,15 +54,117 @@ TARGET_FREQS = [10.0, 15.0]  # Hz
 HARMONICS = 2
 WINDOW_SEC = 2.0
 UPDATE_RATE = 4  # Hz
+GPU_MIN_CHANNELS = 32  # Below this, host/device transfers outweigh the GPU FFT
+GIL_SWITCH_INTERVAL = 0.001  # s - how long the draw loop can wait on the GIL (default 5 ms)
+DETECTION_CPU = 1  # Core for the detection thread; the draw loop keeps the others
+DETECTION_FIFO_PRIORITY = 10  # SCHED_FIFO priority, needs CAP_SYS_NICE (e.g. via chrt/setcap)
+
+
+def _compute_intensities(sin_state, cos_state, eps, gain, out):
+    """
+    Advance every flicker oscillator one frame (magic-circle recurrence)
+    
+    Args:
+        sin_state: Sine track per target, updated in place
+        cos_state: Cosine track per target, updated in place
+        eps: Per-frame rotation coefficients 2*sin(pi*f/refresh) per target
+        gain: Amplitude corrections cos(pi*f/refresh) per target
+        out: Integer array receiving the grayscale level (0-255) per target
+    """
+    sin_state += eps * cos_state
+    cos_state -= eps * sin_state
+    out[:] = (sin_state * gain + 1.0) * 127.5
+
+
+if NUMBA_AVAILABLE:
+    _compute_intensities = njit(cache=True, fastmath=True)(_compute_intensities)
+
+
+def _partition_median(values):
+    """
+    Median along the last axis via np.partition
+    
+    The noise bands are only a handful of bins, where np.median's
+    generic overhead outweighs the selection itself.
+    
+    Args:
+        values: Array whose last axis is reduced
+        
+    Returns:
+        Median of the last axis
+    """
+    n = values.shape[-1]
+    k = n // 2
+    if n % 2:
+        return np.partition(values, k, axis=-1)[..., k]
+    part = np.partition(values, (k - 1, k), axis=-1)
+    return 0.5 * (part[..., k - 1] + part[..., k])
+
+
+def _snr_kernel(psd_mean, target_idx, harmonic_idx, noise_idx, noise_offsets,
+                baseline_noise, harmonic_weight):
+    """
+    SNR of several target frequencies from a channel-averaged PSD (JIT-compiled, GIL-free)
+    
+    Args:
+        psd_mean: Channel-averaged PSD
+        target_idx: Bin of each target frequency
+        harmonic_idx: Bin of each target's second harmonic
+        noise_idx: Noise-band bins of all targets, concatenated
+        noise_offsets: Start of each target's noise bins in noise_idx (plus the end)
+        baseline_noise: Lower bound for the noise estimate (0 to disable)
+        harmonic_weight: Weight of the second harmonic (0 to disable)
+        
+    Returns:
+        Array of signal power over the median of the noise band, one per target
+    """
+    n_targets = target_idx.shape[0]
+    snrs = np.empty(n_targets)
+    for t in range(n_targets):
+        signal_power = psd_mean[target_idx[t]]
+        if harmonic_weight > 0.0:
+            signal_power += harmonic_weight * psd_mean[harmonic_idx[t]]
+        
+        start = noise_offsets[t]
+        stop = noise_offsets[t + 1]
+        if stop == start:
+            snrs[t] = signal_power
+            continue
+        
+        noise_power = np.median(psd_mean[noise_idx[start:stop]])
+        if noise_power < baseline_noise:
+            noise_power = baseline_noise
+        snrs[t] = signal_power / (noise_power + 1e-10)
+    
+    return snrs
+
+
+if NUMBA_AVAILABLE:
+    _snr_kernel = njit(cache=True, nogil=True)(_snr_kernel)
+
+
+@dataclass
+class SelectionChange:
+    """Change of the stable selection, handed from the detection thread to the draw loop"""
+    __slots__ = ('selection',)
+    
+    selection: Optional[int]
+
 
 class IntegratedSSVEP:
     """Combined visual stimulus and SSVEP detector with calibration"""
     
-    def __init__(self, fullscreen=False):
+    def __init__(self, fullscreen=False, use_gpu=False):
         # Visual parameters
         self.frequencies = TARGET_FREQS
+        self._target_freqs = tuple(self.frequencies)  # Hashable key for the bin cache
         self.labels = ["LEFT", "RIGHT"]
         self.fullscreen = fullscreen
+        
+        if use_gpu and not CUPY_AVAILABLE:
+            logger.warning("CuPy not available, computing spectra on the CPU")
+            use_gpu = False
+        self.use_gpu = use_gpu
         self.window_size = (1024, 600)
         
         # Visual elements
@@ -55,7 +184,7 @@ class IntegratedSSVEP:
         self.inlet = None
         self.fs = None
         self.n_channels = None
-        self.buffer = deque(maxlen=500)  # Will be resized after connection
+        self.buffer = None  # Created once the stream rate is known
         
         # Detection parameters
         self.snr_threshold = 2.0
@@ -71,8 +200,10 @@ class IntegratedSSVEP:
         
         # State management
         self.running = False
-        self.calibrating = False
-        self.stimulating = False
+        # Flags shared with the detection thread (see the properties below)
+        self._stim_event = threading.Event()
+        self._calibration_done = threading.Event()
+        self._calibration_done.set()
         self.current_selection = None
         self.confidence = 0.0
         
@@ -80,11 +211,32 @@ class IntegratedSSVEP:
         self.smoothed_powers = np.zeros(len(self.frequencies))
         self.vote_filter = StableVoteFilter(hold_duration_ms=self.hold_ms)
         
-        # Communication queue between threads
-        self.detection_queue = queue.Queue()
-        
-        # Calibration state
-        self.baseline_data = []
+        # Live readout written in place by the detection thread and read by
+        # the draw loop every frame without a lock: smoothed SNRs (NaN until
+        # the first update), the current candidate and self.confidence.
+        # A torn read of the small array only mixes two consecutive updates.
+        self._shared_powers = np.full(len(self.frequencies), np.nan, dtype=np.float32)
+        self._candidate = None
+        
+        # Changes of the stable selection are the only edge-triggered events.
+        # Only the newest one matters, so a single slot swapped under a lock
+        # replaces a queue that could back up with stale entries.
+        self._selection_change = None
+        self._selection_lock = threading.Lock()
+        
+        # Flicker oscillators - magic-circle recurrence advanced once per frame.
+        # The sine track of the recurrence peaks at 1/cos(pi*f/refresh), so it
+        # is scaled back to unit amplitude before mapping to grayscale.
+        # All targets advance together as arrays, whatever their number.
+        self.refresh_rate = 60
+        flicker_freqs = np.asarray(self.frequencies, dtype=np.float64)
+        self._flicker_eps = 2.0 * np.sin(np.pi * flicker_freqs / self.refresh_rate)
+        self._flicker_gain = np.cos(np.pi * flicker_freqs / self.refresh_rate)
+        self._gray = [(v, v, v) for v in range(256)]
+        self.reset_flicker()
+        
+        # Calibration state: baseline LSL chunks, joined once in process_baseline
+        self._baseline_chunks = []
         
         # Initialize Pygame
         pygame.init()
@@ -99,11 +251,19 @@ class IntegratedSSVEP:
         
         pygame.display.set_caption("SSVEP BCI - Integrated System")
         
+        # Keep SDL from queueing event types the loop never reads
+        self._wanted_events = [pygame.QUIT, pygame.KEYDOWN]
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(self._wanted_events)
+        
         # Fonts
         self.font = pygame.font.Font(None, 36)
         self.small_font = pygame.font.Font(None, 24)
         self.large_font = pygame.font.Font(None, 48)
         
+        # Rendered text surfaces, keyed by (font, text, color)
+        self._text_cache = {}
+        
         # Clock
         self.clock = pygame.time.Clock()
         
@@ -115,6 +275,57 @@ class IntegratedSSVEP:
                         center_y - self.box_size // 2)
         self.right_pos = (center_x + self.separation // 2 - self.box_size // 2,
                          center_y - self.box_size // 2)
+        
+        # Fixed box geometry, reused every frame
+        self.left_rect = pygame.Rect(self.left_pos, (self.box_size, self.box_size))
+        self.right_rect = pygame.Rect(self.right_pos, (self.box_size, self.box_size))
+        
+        # Pre-rendered box states: the border is drawn once here and each
+        # frame only blits the state and fills the flickering interior
+        self._box_cache = {}
+        for state, border_color, border_width in [('normal', self.black, 3),
+                                                  ('candidate', self.yellow, 4),
+                                                  ('selected', self.green, 6)]:
+            self._box_cache[state] = (self._make_box_surface(self.white, border_color,
+                                                             border_width),
+                                      border_width)
+        
+        # Calibration boxes do not flicker, so their fill is baked in too
+        self._calibration_boxes = {
+            True: self._make_box_surface(self.yellow, self.red, 6),
+            False: self._make_box_surface((100, 100, 100), self.white, 2)
+        }
+    
+    def _make_box_surface(self, fill_color, border_color, border_width):
+        """Render a filled, bordered box in the display's pixel format"""
+        surface = pygame.Surface((self.box_size, self.box_size)).convert()
+        surface.fill(fill_color)
+        pygame.draw.rect(surface, border_color, surface.get_rect(), border_width)
+        return surface
+    
+    @property
+    def stimulating(self):
+        """Whether the flicker stimulus (and detection) is running"""
+        return self._stim_event.is_set()
+    
+    @stimulating.setter
+    def stimulating(self, value):
+        if value:
+            self._stim_event.set()
+        else:
+            self._stim_event.clear()
+    
+    @property
+    def calibrating(self):
+        """Whether calibration currently owns the LSL inlet"""
+        return not self._calibration_done.is_set()
+    
+    @calibrating.setter
+    def calibrating(self, value):
+        if value:
+            self._calibration_done.clear()
+        else:
+            self._calibration_done.set()
     
     def connect_lsl(self):
         """Connect to LSL stream from OpenBCI GUI"""
@@ -132,14 +343,46 @@ class IntegratedSSVEP:
         self.fs = info.nominal_srate()
         self.n_channels = info.channel_count()
         
-        logger.info(f"Connected to LSL stream: {info.name()}")
-        logger.info(f"Sampling rate: {self.fs} Hz, Channels: {self.n_channels}")
+        logger.info("Connected to LSL stream: %s", info.name())
+        logger.info("Sampling rate: %s Hz, Channels: %d", self.fs, self.n_channels)
+        
+        # Preallocated ring buffer (channels x samples) sized to the analysis window
+        self.buffer = TimeSeriesBuffer(self.n_channels, WINDOW_SEC, self.fs)
+        
+        # Pull up to one update period of samples per LSL call
+        self._chunk_samples = max(32, int(self.fs / UPDATE_RATE))
+        
+        # Every analysis window (ring buffer, 2 s baseline) is zero-padded to
+        # one power-of-two FFT length, so the bin grid never changes and the
+        # windowed input can be staged in a single reusable scratch array
+        max_window = max(self.buffer.buffer_size, int(self.fs * 2))
+        self._nfft = 1 << int(np.ceil(np.log2(max_window)))
+        self._freqs = sp_fft.rfftfreq(self._nfft, d=1.0 / self.fs)
+        self._fft_scratch = np.zeros((self.n_channels, self._nfft), dtype=np.float32)
         
-        # Update buffer size
-        self.buffer = deque(maxlen=int(self.fs * WINDOW_SEC))
+        # Run the transform once so FFT planning (pyFFTW) and scipy's plan
+        # cache are paid for here, not on the first detection tick
+        sp_fft.rfft(self._fft_scratch, axis=1)
+        
+        # Hann window and band-masked density scale per window length,
+        # and the PSD bins each target frequency reads, per spectrum size
+        self._spectrum_cache = {}
+        self._gpu_spectrum_cache = {}
+        self._bin_cache = {}
+        
+        if self.use_gpu and self.n_channels < GPU_MIN_CHANNELS:
+            logger.info("%d channels is below %d, spectra stay on the CPU",
+                        self.n_channels, GPU_MIN_CHANNELS)
         
         return True
     
+    def _get_window(self):
+        """Get the buffered window (channels x samples), using optimal channels if available"""
+        data = self.buffer.get_latest_view(len(self.buffer))
+        if self.optimal_channels:
+            return data[self.optimal_channels]
+        return data
+    
     def find_optimal_channels(self, data):
         """Find channels with best SSVEP response"""
         if self.n_channels >= 16:
@@ -151,63 +394,155 @@ class IntegratedSSVEP:
         else:
             test_channels = list(range(self.n_channels))
         
-        # Compute SNR for each channel
-        channel_snrs = []
-        for ch in test_channels:
-            ch_data = data[ch:ch+1, :]
-            snr_sum = 0
-            for freq in self.frequencies:
-                snr = self.compute_ssvep_power(ch_data, freq)
-                snr_sum += snr
-            channel_snrs.append(snr_sum)
+        # Compute SNR for each channel from one multichannel PSD
+        freqs, psd = self._prepare_psd(data[test_channels, :], average=False)
+        channel_snrs = np.zeros(len(test_channels))
+        bins = self._frequency_bins(freqs, self._target_freqs)
+        for t, noise_band in enumerate(bins['noise_bands']):
+            signal_power = psd[:, bins['target'][t]]
+            if HARMONICS >= 2:
+                signal_power = signal_power + 0.3 * psd[:, bins['harmonic'][t]]
+            
+            if len(noise_band) > 0:
+                noise_power = _partition_median(psd[:, noise_band])
+                if self.baseline_noise is not None:
+                    noise_power = np.maximum(noise_power, self.baseline_noise)
+                channel_snrs += signal_power / (noise_power + 1e-10)
+            else:
+                channel_snrs += signal_power
         
         # Select top 3 channels
-        best_indices = np.argsort(channel_snrs)[-3:]
+        n_best = min(3, len(test_channels))
+        best_indices = np.argpartition(channel_snrs, -n_best)[-n_best:]
         self.optimal_channels = [test_channels[i] for i in best_indices]
         
-        logger.info(f"Optimal channels selected: {self.optimal_channels}")
+        logger.info("Optimal channels selected: %s", self.optimal_channels)
         return self.optimal_channels
     
     def compute_ssvep_power(self, data, freq):
         """Compute SSVEP power with improved processing"""
-        # Bandpass filter
-        sos = signal.butter(4, [5, 45], btype='band', fs=self.fs, output='sos')
-        filtered = signal.sosfiltfilt(sos, data, axis=1)
-        
-        # Notch filter for power line noise
-        notch_sos = signal.butter(2, [59, 61], btype='bandstop', fs=self.fs, output='sos')
-        filtered = signal.sosfiltfilt(notch_sos, filtered, axis=1)
-        
-        # Compute PSD
-        nperseg = min(data.shape[1], int(self.fs * 1.5))
-        freqs, psd = welch(filtered, fs=self.fs, nperseg=nperseg, 
-                          noverlap=nperseg//2, axis=1)
+        freqs, psd_mean = self._prepare_psd(data)
+        return self._snr_from_psd(freqs, psd_mean, freq)
+    
+    def _spectrum_setup(self, n_samples):
+        """Get the Hann window and band-masked PSD scale for a window length"""
+        setup = self._spectrum_cache.get(n_samples)
+        if setup is None:
+            window = np.hanning(n_samples).astype(np.float32)
+            freqs = self._freqs
+            
+            # Bandpass 5-45 Hz and power line notch, applied as a bin mask
+            keep = (freqs >= 5) & (freqs <= 45) & ~((freqs >= 59) & (freqs <= 61))
+            
+            # One-sided density scaling, matching welch
+            scale = np.where(keep, 2.0 / (self.fs * np.sum(window ** 2)), 0.0).astype(np.float32)
+            
+            setup = (window, scale)
+            self._spectrum_cache[n_samples] = setup
+        return setup
+    
+    def _prepare_psd(self, data, average=True):
+        """Compute the band-limited PSD of a window once for all target frequencies"""
+        n_rows, n_samples = data.shape
+        if self.use_gpu and n_rows >= GPU_MIN_CHANNELS:
+            return self._prepare_psd_gpu(data, average)
+        
+        window, scale = self._spectrum_setup(n_samples)
+        
+        # Single Hann-windowed rFFT of the window, kept in float32 (complex64
+        # spectrum) since EEG needs no more precision. All band limiting is
+        # done by the bin mask, so only the DC offset is removed here; any
+        # residual drift leaks into bins below 5 Hz, which are masked anyway.
+        # The input is staged in the scratch array, zero-padded to nfft, and
+        # the FFT may overwrite it.
+        x = self._fft_scratch[:n_rows]
+        np.subtract(data, data.mean(axis=1, keepdims=True), out=x[:, :n_samples])
+        x[:, :n_samples] *= window
+        x[:, n_samples:] = 0.0
+        spectrum = sp_fft.rfft(x, axis=1, overwrite_x=True)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2) * scale
+        
+        if not average:
+            return self._freqs, psd
         
         # Average across channels
-        psd_mean = np.mean(psd, axis=0)
-        
-        # Target frequency power
-        target_idx = np.argmin(np.abs(freqs - freq))
-        signal_power = psd_mean[target_idx]
-        
-        # Add harmonic
-        if HARMONICS >= 2:
-            harmonic_idx = np.argmin(np.abs(freqs - freq * 2))
-            if harmonic_idx < len(psd_mean):
-                signal_power += 0.3 * psd_mean[harmonic_idx]
-        
-        # Calculate noise
-        noise_band = np.where((freqs >= freq - 2) & (freqs <= freq + 2) & 
-                              (np.abs(freqs - freq) > 0.5))[0]
-        if len(noise_band) > 0:
-            noise_power = np.median(psd_mean[noise_band])
-            if self.baseline_noise is not None:
-                noise_power = max(noise_power, self.baseline_noise)
-            snr = signal_power / (noise_power + 1e-10)
-        else:
-            snr = signal_power
-        
-        return snr
+        return self._freqs, np.mean(psd, axis=0)
+    
+    def _prepare_psd_gpu(self, data, average=True):
+        """CuPy version of _prepare_psd for windows with many channels"""
+        n_samples = data.shape[1]
+        setup = self._gpu_spectrum_cache.get(n_samples)
+        if setup is None:
+            window, scale = self._spectrum_setup(n_samples)
+            setup = (cp.asarray(window), cp.asarray(scale))
+            self._gpu_spectrum_cache[n_samples] = setup
+        window, scale = setup
+        
+        # One upload, then demean, window, FFT and power all on the device
+        x = cp.asarray(data, dtype=cp.float32)
+        x -= x.mean(axis=1, keepdims=True)
+        x *= window
+        spectrum = cp.fft.rfft(x, n=self._nfft, axis=1)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2) * scale
+        
+        if average:
+            psd = psd.mean(axis=0)
+        return self._freqs, cp.asnumpy(psd)
+    
+    def _frequency_bins(self, freqs, targets):
+        """Get the target, harmonic and noise-band bins of target frequencies (cached per spectrum size)"""
+        key = (len(freqs), targets)
+        bins = self._bin_cache.get(key)
+        if bins is None:
+            noise_bands = [np.where((freqs >= freq - 2) & (freqs <= freq + 2) & 
+                                    (np.abs(freqs - freq) > 0.5))[0]
+                           for freq in targets]
+            bins = {
+                'target': np.array([np.argmin(np.abs(freqs - freq)) for freq in targets]),
+                'harmonic': np.array([np.argmin(np.abs(freqs - freq * 2)) for freq in targets]),
+                'noise_bands': noise_bands,
+                'noise_idx': np.concatenate(noise_bands).astype(np.intp),
+                'noise_offsets': np.cumsum([0] + [len(band) for band in noise_bands])
+            }
+            self._bin_cache[key] = bins
+        return bins
+    
+    def _snrs_from_psd(self, freqs, psd_mean, targets):
+        """
+        Extract the SNR of several frequencies from a precomputed PSD
+        
+        Args:
+            freqs: Bin frequencies of the PSD
+            psd_mean: Channel-averaged PSD
+            targets: Tuple of frequencies to score
+            
+        Returns:
+            Array of SNRs, one per target
+        """
+        bins = self._frequency_bins(freqs, targets)
+        harmonic_weight = 0.3 if HARMONICS >= 2 else 0.0
+        
+        if NUMBA_AVAILABLE:
+            baseline = self.baseline_noise if self.baseline_noise is not None else 0.0
+            return _snr_kernel(psd_mean, bins['target'], bins['harmonic'], bins['noise_idx'],
+                               bins['noise_offsets'], float(baseline), harmonic_weight)
+        
+        # Target (+ harmonic) power for every frequency at once
+        signal_power = psd_mean[bins['target']] + harmonic_weight * psd_mean[bins['harmonic']]
+        
+        # Noise bands can differ in length by a bin, so take their medians one by one
+        noise_power = np.array([_partition_median(psd_mean[band]) if len(band) > 0 else np.nan
+                                for band in bins['noise_bands']])
+        if self.baseline_noise is not None:
+            noise_power = np.fmax(noise_power, self.baseline_noise)
+        
+        # Targets without a noise band fall back to raw signal power
+        return np.where(np.isnan(noise_power), signal_power,
+                        signal_power / (noise_power + 1e-10))
+    
+    def _snr_from_psd(self, freqs, psd_mean, freq):
+        """Extract the SNR of one frequency from a precomputed PSD"""
+        return self._snrs_from_psd(freqs, psd_mean, (freq,))[0]
     
     def calibration_phase(self):
         """Run calibration to optimize detection parameters"""
@@ -237,7 +572,7 @@ class IntegratedSSVEP:
         self.calibration_start_time = time.time()
         self.calibration_duration = step["duration"]
         
-        logger.info(f"Calibration step {self.calibration_step + 1}: {self.calibration_message}")
+        logger.info("Calibration step %d: %s", self.calibration_step + 1, self.calibration_message)
     
     def update_calibration(self):
         """Update calibration progress and collect data"""
@@ -246,25 +581,20 @@ class IntegratedSSVEP:
         
         elapsed = time.time() - self.calibration_start_time
         
-        # Collect data
-        chunk, _ = self.inlet.pull_chunk(timeout=0.0, max_samples=32)
+        # Collect data (non-blocking, this runs on the render thread)
+        chunk, _ = self.inlet.pull_chunk(timeout=0.0, max_samples=self._chunk_samples)
         if chunk:
+            chunk = np.asarray(chunk, dtype=np.float32)
             if self.calibration_step == 0:  # Baseline
-                for sample in chunk:
-                    self.baseline_data.append(sample)
+                self._baseline_chunks.append(chunk)
             else:
-                for sample in chunk:
-                    self.buffer.append(sample)
+                self.buffer.add_samples(chunk.T)
                 
                 # Process for frequency-specific calibration
                 step = self.calibration_steps[self.calibration_step]
                 freq_index = step["freq_index"]
                 if freq_index is not None and len(self.buffer) >= self.fs * 1.5:
-                    data = np.array(self.buffer)
-                    if self.optimal_channels:
-                        data = data[:, self.optimal_channels].T
-                    else:
-                        data = data.T
+                    data = self._get_window()
                     
                     freq = self.frequencies[freq_index]
                     snr = self.compute_ssvep_power(data, freq)
@@ -285,23 +615,24 @@ class IntegratedSSVEP:
     
     def process_baseline(self):
         """Process baseline data to find optimal channels and noise level"""
-        if not hasattr(self, 'baseline_data'):
-            self.baseline_data = []
+        if not self._baseline_chunks:
             return
         
-        if len(self.baseline_data) > self.fs:
-            baseline_array = np.array(self.baseline_data[-int(self.fs*2):]).T
+        baseline_data = np.concatenate(self._baseline_chunks)
+        if len(baseline_data) > self.fs:
+            baseline_array = baseline_data[-int(self.fs*2):].T
             
             # Find optimal channels
             self.find_optimal_channels(baseline_array)
             
-            # Calculate baseline noise
-            noise_levels = []
-            for freq in range(5, 30):
-                if freq not in self.frequencies:
-                    noise_levels.append(self.compute_ssvep_power(baseline_array, freq))
-            self.baseline_noise = np.median(noise_levels)
-            logger.info(f"Baseline noise level: {self.baseline_noise:.2f}")
+            # Calculate baseline noise as the median baseline power over the
+            # off-target frequencies; it floors the noise power, so it is
+            # read straight off the PSD rather than from per-frequency SNRs
+            freqs, psd_mean = self._prepare_psd(baseline_array)
+            sweep = tuple(float(freq) for freq in range(5, 30) if freq not in self.frequencies)
+            noise_bins = self._frequency_bins(freqs, sweep)['target']
+            self.baseline_noise = float(_partition_median(psd_mean[noise_bins]))
+            logger.info("Baseline noise level: %.2f", self.baseline_noise)
     
     def finish_calibration(self):
         """Complete calibration and calculate thresholds"""
@@ -313,8 +644,7 @@ class IntegratedSSVEP:
         logger.info("Calibration complete!")
         
         # Clear baseline data to save memory
-        if hasattr(self, 'baseline_data'):
-            del self.baseline_data
+        self._baseline_chunks = []
     
     def calculate_thresholds(self):
         """Calculate personalized detection thresholds from calibration"""
@@ -338,84 +668,144 @@ class IntegratedSSVEP:
             min_snr = min(s['p75'] for s in stats.values())
             self.snr_threshold = max(1.5, min_snr * 0.7)  # 70% of weakest response
             
-            logger.info(f"Personalized SNR threshold: {self.snr_threshold:.2f}")
+            logger.info("Personalized SNR threshold: %.2f", self.snr_threshold)
             for freq, stat in stats.items():
-                logger.info(f"{freq}Hz - Mean: {stat['mean']:.2f}, Max: {stat['max']:.2f}")
+                logger.info("%sHz - Mean: %.2f, Max: %.2f", freq, stat['mean'], stat['max'])
+    
+    def _pin_detection_thread(self):
+        """
+        Move the calling thread onto its own core and, when permitted, into
+        the real-time scheduling class so the 60 Hz draw loop does not add
+        jitter to detection updates. Linux only; anything that is
+        unavailable or not permitted is silently skipped.
+        """
+        # On Linux, pid 0 addresses the calling thread
+        if hasattr(os, 'sched_setaffinity'):
+            try:
+                allowed = os.sched_getaffinity(0)
+                if len(allowed) > 1 and DETECTION_CPU in allowed:
+                    os.sched_setaffinity(0, {DETECTION_CPU})
+            except OSError:
+                pass
+        
+        # Real-time scheduling requires root or CAP_SYS_NICE, e.g. starting
+        # the program under `chrt` or after `setcap cap_sys_nice+ep` on python
+        if hasattr(os, 'sched_setscheduler'):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO,
+                                      os.sched_param(DETECTION_FIFO_PRIORITY))
+            except OSError:
+                pass
     
     def detection_thread(self):
         """Background thread for SSVEP detection"""
+        self._pin_detection_thread()
         last_update = time.time()
         
+        # Loop invariants
+        shared_powers = self._shared_powers
+        last_selection = None
+        inlet = self.inlet
+        buffer = self.buffer
+        chunk_samples = self._chunk_samples
+        min_samples = self.fs * 0.5
+        stim_event = self._stim_event
+        calibration_done = self._calibration_done
+        
+        # Block for up to one update period per pull instead of spinning on
+        # empty non-blocking polls
+        update_period = 1.0 / UPDATE_RATE
+        
         while self.running:
             try:
-                # Pull data from LSL
-                chunk, _ = self.inlet.pull_chunk(timeout=0.0, max_samples=32)
+                # Calibration reads the inlet itself; the ring buffer takes a
+                # single writer, so block until calibration is done
+                if not calibration_done.wait(update_period):
+                    continue
+                
+                # Pull data from LSL. Keep draining it while the stimulus is
+                # off so detection starts on fresh samples, not a backlog.
+                chunk, _ = inlet.pull_chunk(timeout=update_period,
+                                            max_samples=chunk_samples)
                 
                 if chunk:
-                    for sample in chunk:
-                        self.buffer.append(sample)
+                    buffer.add_samples(np.asarray(chunk, dtype=np.float32).T)
                 
                 # Process at UPDATE_RATE
-                if (time.time() - last_update > 1.0/UPDATE_RATE and 
-                    len(self.buffer) >= self.fs * 0.5 and 
-                    self.stimulating):
+                if (stim_event.is_set() and 
+                    time.time() - last_update > update_period and 
+                    len(buffer) >= min_samples):
                     
-                    # Convert buffer to array
-                    data = np.array(self.buffer)
+                    data = self._get_window()
                     
-                    # Use optimal channels if available
-                    if self.optimal_channels:
-                        data = data[:, self.optimal_channels].T
-                    else:
-                        data = data.T
-                    
-                    # Compute power for each frequency
-                    powers = []
-                    for freq in self.frequencies:
-                        power = self.compute_ssvep_power(data, freq)
-                        powers.append(power)
+                    # Compute power for each frequency from a single PSD
+                    freqs, psd_mean = self._prepare_psd(data)
+                    raw_powers = self._snrs_from_psd(freqs, psd_mean, self._target_freqs)
                     
-                    # Smooth estimates
-                    powers = np.array(powers)
-                    self.smoothed_powers = (
-                        self.ema_alpha * powers + 
-                        (1 - self.ema_alpha) * self.smoothed_powers
-                    )
+                    # Smooth estimates (in place)
                     powers = self.smoothed_powers
+                    powers *= 1 - self.ema_alpha
+                    powers += self.ema_alpha * raw_powers
+                    
+                    np.copyto(shared_powers, powers)
                     
                     # Detection logic
-                    if (np.max(powers) > self.snr_threshold and 
-                        np.max(powers) > np.min(powers) * self.margin_ratio):
+                    winner = int(np.argmax(powers))
+                    peak = powers[winner]
+                    if (peak > self.snr_threshold and 
+                        peak > powers.min() * self.margin_ratio):
                         
-                        winner = int(np.argmax(powers))
                         stable = self.vote_filter.update(winner)
                         
                         # Calculate confidence
-                        self.confidence = (powers[winner] - self.snr_threshold) / self.snr_threshold
-                        self.confidence = min(1.0, self.confidence)
-                        
-                        # Send detection result
-                        self.detection_queue.put({
-                            'selection': stable,
-                            'candidate': winner,
-                            'powers': powers.copy(),
-                            'confidence': self.confidence
-                        })
+                        self.confidence = min(1.0, (peak - self.snr_threshold) / self.snr_threshold)
+                        self._candidate = winner
                     else:
                         self.vote_filter.reset()
-                        self.detection_queue.put({
-                            'selection': None,
-                            'candidate': None,
-                            'powers': powers.copy(),
-                            'confidence': 0.0
-                        })
+                        stable = None
+                        self.confidence = 0.0
+                        self._candidate = None
+                    
+                    # Send the selection only when it changes
+                    if stable != last_selection:
+                        self._publish_selection(SelectionChange(stable))
+                        last_selection = stable
                     
                     last_update = time.time()
                     
             except Exception as e:
-                logger.error(f"Detection error: {e}")
+                logger.error("Detection error: %s", e)
                 time.sleep(0.1)
     
+    def _publish_selection(self, change):
+        """Replace the pending selection change with a newer one"""
+        with self._selection_lock:
+            self._selection_change = change
+    
+    def _take_selection(self):
+        """Take the pending selection change, or None if the selection is unchanged"""
+        with self._selection_lock:
+            change = self._selection_change
+            self._selection_change = None
+        return change
+    
+    def _reset_readout(self):
+        """Clear the live SNR/candidate readout before a new stimulus run"""
+        self._shared_powers.fill(np.nan)
+        self._candidate = None
+    
+    def _render_text(self, font, text, color):
+        """Render text once and reuse the surface on later frames"""
+        key = (font, text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            # Numeric readouts (SNR, countdown) keep producing new strings
+            if len(self._text_cache) >= 512:
+                self._text_cache.clear()
+            surface = font.render(text, True, color)
+            self._text_cache[key] = surface
+        return surface
+    
     def draw_interface(self):
         """Draw the main interface"""
         # Clear screen
@@ -426,7 +816,7 @@ class IntegratedSSVEP:
         if self.calibrating:
             title += " - CALIBRATION MODE"
         
-        text = self.large_font.render(title, True, self.white)
+        text = self._render_text(self.large_font, title, self.white)
         text_rect = text.get_rect(centerx=self.window_size[0]//2, y=20)
         self.screen.blit(text, text_rect)
         
@@ -448,7 +838,7 @@ class IntegratedSSVEP:
         
         y_offset = 80
         for line in instructions:
-            text = self.small_font.render(line, True, self.white)
+            text = self._render_text(self.small_font, line, self.white)
             text_rect = text.get_rect(centerx=self.window_size[0]//2, y=y_offset)
             self.screen.blit(text, text_rect)
             y_offset += 25
@@ -466,13 +856,13 @@ class IntegratedSSVEP:
         
         # Title
         title = f"CALIBRATION - Step {self.calibration_step + 1} of {len(self.calibration_steps)}"
-        text = self.large_font.render(title, True, self.yellow)
+        text = self._render_text(self.large_font, title, self.yellow)
         text_rect = text.get_rect(centerx=self.window_size[0]//2, y=50)
         self.screen.blit(text, text_rect)
         
         # Current instruction
         instruction = self.calibration_message
-        text = self.font.render(instruction, True, self.white)
+        text = self._render_text(self.font, instruction, self.white)
         text_rect = text.get_rect(centerx=self.window_size[0]//2, y=150)
         self.screen.blit(text, text_rect)
         
@@ -502,7 +892,7 @@ class IntegratedSSVEP:
             # Time remaining
             remaining = max(0, self.calibration_duration - elapsed)
             time_text = f"Time remaining: {remaining:.1f}s"
-            text = self.small_font.render(time_text, True, self.white)
+            text = self._render_text(self.small_font, time_text, self.white)
             text_rect = text.get_rect(centerx=self.window_size[0]//2, y=bar_y + 30)
             self.screen.blit(text, text_rect)
         
@@ -521,89 +911,53 @@ class IntegratedSSVEP:
         
         elif self.calibration_step > 0:  # Show boxes with highlighting
             # Draw both boxes but highlight the target
-            for i, (pos, label) in enumerate([(self.left_pos, self.labels[0]),
-                                              (self.right_pos, self.labels[1])]):
-                if i == self.calibration_steps[self.calibration_step]["freq_index"]:
-                    # Highlight target box
-                    color = self.yellow
-                    border_color = self.red
-                    border_width = 6
-                else:
-                    # Normal box
-                    color = (100, 100, 100)
-                    border_color = self.white
-                    border_width = 2
-                
-                pygame.draw.rect(self.screen, color,
-                               (pos[0], pos[1], self.box_size, self.box_size))
-                pygame.draw.rect(self.screen, border_color,
-                               (pos[0], pos[1], self.box_size, self.box_size), border_width)
+            for i, (rect, label) in enumerate([(self.left_rect, self.labels[0]),
+                                               (self.right_rect, self.labels[1])]):
+                # Highlight the target box
+                is_target = i == self.calibration_steps[self.calibration_step]["freq_index"]
+                self.screen.blit(self._calibration_boxes[is_target], rect)
                 
                 # Label
-                text = self.font.render(label, True, self.white)
-                text_rect = text.get_rect(centerx=pos[0] + self.box_size//2,
-                                          bottom=pos[1] - 20)
+                text = self._render_text(self.font, label, self.white)
+                text_rect = text.get_rect(centerx=rect.centerx, bottom=rect.top - 20)
                 self.screen.blit(text, text_rect)
             
             # Show frequency for target box
             target_freq = self.frequencies[self.calibration_steps[self.calibration_step]["freq_index"]]
             freq_text = f"Focus on {target_freq}Hz stimulus"
-            text = self.font.render(freq_text, True, self.yellow)
+            text = self._render_text(self.font, freq_text, self.yellow)
             text_rect = text.get_rect(centerx=self.window_size[0]//2,
                                       bottom=self.window_size[1] - 50)
             self.screen.blit(text, text_rect)
     
     def draw_boxes(self, left_color, right_color):
         """Draw flickering boxes with selection feedback"""
-        # Get current detection result
-        detection = None
-        try:
-            detection = self.detection_queue.get_nowait()
-            self.current_selection = detection.get('selection')
-            self.confidence = detection.get('confidence', 0)
-        except queue.Empty:
-            pass
-        
-        # Draw left box
-        left_border_color = self.black
-        left_border_width = 3
-        
-        if self.current_selection == 0:
-            left_border_color = self.green
-            left_border_width = 6
-        elif detection and detection.get('candidate') == 0:
-            left_border_color = self.yellow
-            left_border_width = 4
-        
-        pygame.draw.rect(self.screen, left_color,
-                        (self.left_pos[0], self.left_pos[1], 
-                         self.box_size, self.box_size))
-        pygame.draw.rect(self.screen, left_border_color,
-                        (self.left_pos[0], self.left_pos[1], 
-                         self.box_size, self.box_size), left_border_width)
-        
-        # Draw right box
-        right_border_color = self.black
-        right_border_width = 3
-        
-        if self.current_selection == 1:
-            right_border_color = self.green
-            right_border_width = 6
-        elif detection and detection.get('candidate') == 1:
-            right_border_color = self.yellow
-            right_border_width = 4
-        
-        pygame.draw.rect(self.screen, right_color,
-                        (self.right_pos[0], self.right_pos[1], 
-                         self.box_size, self.box_size))
-        pygame.draw.rect(self.screen, right_border_color,
-                        (self.right_pos[0], self.right_pos[1], 
-                         self.box_size, self.box_size), right_border_width)
+        # Apply a selection change, then read the live readout (only
+        # meaningful while the stimulus runs)
+        change = self._take_selection()
+        if change is not None:
+            self.current_selection = change.selection
+        candidate = self._candidate if self.stimulating else None
+        
+        # Blit each box's pre-rendered border state, then fill only the
+        # interior with the flicker intensity
+        for i, (rect, color) in enumerate([(self.left_rect, left_color),
+                                           (self.right_rect, right_color)]):
+            if self.current_selection == i:
+                state = 'selected'
+            elif candidate == i:
+                state = 'candidate'
+            else:
+                state = 'normal'
+            
+            surface, border_width = self._box_cache[state]
+            self.screen.blit(surface, rect)
+            self.screen.fill(color, rect.inflate(-2 * border_width, -2 * border_width))
         
         # Labels
         for i, (pos, label) in enumerate([(self.left_pos, self.labels[0]), 
                                            (self.right_pos, self.labels[1])]):
-            text = self.font.render(label, True, self.white)
+            text = self._render_text(self.font, label, self.white)
             text_rect = text.get_rect(centerx=pos[0] + self.box_size//2,
                                       bottom=pos[1] - 20)
             self.screen.blit(text, text_rect)
@@ -612,14 +966,14 @@ class IntegratedSSVEP:
         if self.current_selection is not None:
             selection_text = f"SELECTED: {self.labels[self.current_selection]}"
             color = self.green
-        elif detection and detection.get('candidate') is not None:
-            selection_text = f"Detecting: {self.labels[detection['candidate']]}"
+        elif candidate is not None:
+            selection_text = f"Detecting: {self.labels[candidate]}"
             color = self.yellow
         else:
             selection_text = "Looking for signal..."
             color = self.white
         
-        text = self.font.render(selection_text, True, color)
+        text = self._render_text(self.font, selection_text, color)
         text_rect = text.get_rect(centerx=self.window_size[0]//2,
                                   bottom=self.window_size[1] - 80)
         self.screen.blit(text, text_rect)
@@ -632,8 +986,7 @@ class IntegratedSSVEP:
             bar_y = self.window_size[1] - 50
             
             # Background
-            pygame.draw.rect(self.screen, self.black,
-                           (bar_x, bar_y, bar_width, bar_height))
+            self.screen.fill(self.black, (bar_x, bar_y, bar_width, bar_height))
             
             # Fill based on confidence
             fill_width = int(bar_width * self.confidence)
@@ -644,40 +997,36 @@ class IntegratedSSVEP:
             else:
                 bar_color = self.red
             
-            pygame.draw.rect(self.screen, bar_color,
-                           (bar_x, bar_y, fill_width, bar_height))
+            self.screen.fill(bar_color, (bar_x, bar_y, fill_width, bar_height))
             
             # Border
             pygame.draw.rect(self.screen, self.white,
                            (bar_x, bar_y, bar_width, bar_height), 2)
         
         # SNR display
-        if detection and detection.get('powers') is not None:
-            powers = detection['powers']
+        powers = self._shared_powers
+        if self.stimulating and not np.isnan(powers[0]):
             for i, (freq, power) in enumerate(zip(self.frequencies, powers)):
                 text = f"{freq}Hz SNR: {power:.2f}"
                 color = self.green if power > self.snr_threshold else self.white
-                snr_text = self.small_font.render(text, True, color)
+                snr_text = self._render_text(self.small_font, text, color)
                 snr_rect = snr_text.get_rect(x=20, y=self.window_size[1] - 100 + i*25)
                 self.screen.blit(snr_text, snr_rect)
     
-    def update_flicker(self, start_time):
-        """Calculate flicker states"""
-        current_time = time.time()
-        elapsed = current_time - start_time
-        
-        # Calculate phases
-        left_phase = np.sin(2 * np.pi * self.frequencies[0] * elapsed)
-        right_phase = np.sin(2 * np.pi * self.frequencies[1] * elapsed)
-        
-        # Convert to colors
-        left_intensity = int((left_phase + 1) * 127.5)
-        right_intensity = int((right_phase + 1) * 127.5)
-        
-        left_color = (left_intensity, left_intensity, left_intensity)
-        right_color = (right_intensity, right_intensity, right_intensity)
+    def reset_flicker(self):
+        """Restart all flicker oscillators at zero phase"""
+        n_targets = len(self.frequencies)
+        self._flicker_sin = np.zeros(n_targets)
+        self._flicker_cos = np.ones(n_targets)
+        self._flicker_levels = np.zeros(n_targets, dtype=np.intp)
+    
+    def update_flicker(self):
+        """Advance flicker oscillators by one frame and return box colors, one per target"""
+        _compute_intensities(self._flicker_sin, self._flicker_cos,
+                             self._flicker_eps, self._flicker_gain, self._flicker_levels)
         
-        return left_color, right_color
+        gray = self._gray
+        return [gray[level] for level in self._flicker_levels.tolist()]
     
     def run(self):
         """Main application loop"""
@@ -689,43 +1038,47 @@ class IntegratedSSVEP:
             logger.error("Failed to connect to LSL stream")
             return
         
+        # The draw loop shares the interpreter with the detection thread. Cap
+        # how long it can wait for the GIL while that thread runs Python code;
+        # the default 5 ms is almost a third of a 60 Hz frame.
+        sys.setswitchinterval(GIL_SWITCH_INTERVAL)
+        
         # Start detection thread
         self.running = True
         detection_thread = threading.Thread(target=self.detection_thread)
         detection_thread.daemon = True
         detection_thread.start()
         
-        # Main loop
-        start_time = None
-        
         logger.info("System ready. Press C to calibrate, SPACE to start.")
         
         while self.running:
-            # Handle events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
+            # Handle events - only touch the queue when something is pending
+            if pygame.event.peek(self._wanted_events):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
                         self.running = False
-                    elif event.key == pygame.K_SPACE:
-                        if not self.calibrating:
-                            self.stimulating = not self.stimulating
-                            if self.stimulating:
-                                start_time = time.time()
-                                logger.info("Stimulus started")
-                            else:
-                                logger.info("Stimulus stopped")
-                    elif event.key == pygame.K_c:
-                        if not self.stimulating:
-                            self.calibration_phase()
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
+                            self.running = False
+                        elif event.key == pygame.K_SPACE:
+                            if not self.calibrating:
+                                self.stimulating = not self.stimulating
+                                if self.stimulating:
+                                    self.reset_flicker()
+                                    self._reset_readout()
+                                    logger.info("Stimulus started")
+                                else:
+                                    logger.info("Stimulus stopped")
+                        elif event.key == pygame.K_c:
+                            if not self.stimulating:
+                                self.calibration_phase()
             
             # Draw interface
             self.draw_interface()
             
             # Draw stimulus boxes
-            if self.stimulating and start_time:
-                left_color, right_color = self.update_flicker(start_time)
+            if self.stimulating:
+                left_color, right_color = self.update_flicker()
                 self.draw_boxes(left_color, right_color)
             elif not self.calibrating:
                 # Static boxes when not stimulating
@@ -737,7 +1090,7 @@ class IntegratedSSVEP:
             
             # Update display
             pygame.display.flip()
-            self.clock.tick(60)
+            self.clock.tick(self.refresh_rate)
         
         # Cleanup
         pygame.quit()
@@ -751,18 +1104,20 @@ def main():
     parser = argparse.ArgumentParser(description='Integrated SSVEP BCI System')
     parser.add_argument('--fullscreen', action='store_true',
                        help='Run in fullscreen mode')
+    parser.add_argument('--gpu', action='store_true',
+                       help=f'Compute spectra with CuPy for {GPU_MIN_CHANNELS}+ channel windows')
     
     args = parser.parse_args()
     
     # Create and run system
-    system = IntegratedSSVEP(fullscreen=args.fullscreen)
+    system = IntegratedSSVEP(fullscreen=args.fullscreen, use_gpu=args.gpu)
     
     try:
         system.run()
     except KeyboardInterrupt:
         logger.info("Interrupted by user")
     except Exception as e:
-        logger.error(f"Error: {e}")
+        logger.error("Error: %s", e)
         import traceback
         traceback.print_exc()
 
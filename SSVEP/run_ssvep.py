@@ -4,6 +4,7 @@ import numpy as np
 import time
 import logging
 import threading
+import queue
 import sys
 import os
 from typing import Optional, List
@@ -16,7 +17,7 @@ import config
 from acquisition import OpenBCIAcquisition
 from synthetic import SyntheticSSVEPGenerator, synth_ssvep
 from filters import SSVEPFilters
-from detector_psd import PSDDetector
+from detector_psd import PSDDetector, ProcessScorer
 from utils import TimeSeriesBuffer, StableVoteFilter, format_detection_output
 
 # Configure logging
@@ -50,8 +51,13 @@ class SSVEPSystem:
         self.is_running = False
         self.sampling_rate = None
         self.num_channels = None
+        self.acquisition_thread = None
         self.detection_thread = None
         
+        # Signals the detection thread that a new step of samples is buffered;
+        # one slot, so a busy detector only ever catches up to the newest window
+        self.window_ready = queue.Queue(maxsize=1)
+        
         # Statistics
         self.detection_count = 0
         self.start_time = None
@@ -104,10 +110,11 @@ class SSVEPSystem:
                 target_freqs=config.FREQS,
                 harmonics=config.HARMONICS,
                 snr_neighbor_bw=config.SNR_NEIGHBOR_BW,
-                snr_exclude_bw=config.SNR_EXCLUDE_BW
+                snr_exclude_bw=config.SNR_EXCLUDE_BW,
+                window_samples=int(config.WINDOW_SEC * self.sampling_rate)
             )
             
-            # Setup data buffer
+            # Setup data buffer (holds the filtered stream)
             self.data_buffer = TimeSeriesBuffer(
                 n_channels=self.num_channels,
                 buffer_duration=config.BUFFER_DURATION,
@@ -142,72 +149,121 @@ class SSVEPSystem:
             logger.error(f"Failed to start acquisition: {e}")
             return False
     
+    def _acquisition_loop(self):
+        """Pull samples into the filtered ring buffer (runs in separate thread)
+        
+        Kept free of any PSD work so a slow detection tick never delays
+        draining the board. Every STEP_SEC worth of samples it signals the
+        detection thread through a one-slot queue.
+        """
+        logger.info("Acquisition loop started")
+        
+        step_samples = int(config.STEP_SEC * self.sampling_rate)
+        
+        # Bind config values and components to locals once; they don't change
+        # while the loop runs
+        data_timeout = config.STEP_SEC / 4
+        acquisition = self.acquisition
+        filters = self.filters
+        data_buffer = self.data_buffer
+        window_ready = self.window_ready
+        
+        # Processing is paced by samples received, so the loop needs no clock
+        samples_since_process = 0
+        
+        while self.is_running:
+            try:
+                # Read new samples straight into the ring's free slots; the
+                # timeout only bounds how long a stop request can go unnoticed
+                block = data_buffer.reserve_write(step_samples)
+                n_new = acquisition.get_data(timeout=data_timeout, out=block)
+                
+                if n_new > 0:
+                    # Filter only the new samples in place and publish them
+                    block[:, :n_new] = filters.apply_stream(block[:, :n_new])
+                    data_buffer.commit_write(n_new)
+                    samples_since_process += n_new
+                    
+                    # Signal the detector once a step's worth of samples has
+                    # arrived; if it is still busy, the pending signal already
+                    # covers the newest window
+                    if samples_since_process >= step_samples:
+                        try:
+                            window_ready.put_nowait(None)
+                        except queue.Full:
+                            pass
+                        samples_since_process = 0
+                
+            except Exception as e:
+                logger.error(f"Error in acquisition loop: {e}")
+                time.sleep(0.1)  # Longer sleep on error
+        
+        logger.info("Acquisition loop stopped")
+    
     def _detection_loop(self):
         """Main detection loop (runs in separate thread)"""
         logger.info("Detection loop started")
         
         window_samples = int(config.WINDOW_SEC * self.sampling_rate)
-        step_samples = int(config.STEP_SEC * self.sampling_rate)
         
-        last_process_time = time.time()
+        # Bind config values and components to locals once; they don't change
+        # while the loop runs
+        min_snr = config.MIN_SNR_THRESHOLD
+        data_buffer = self.data_buffer
+        detector = self.detector
+        vote_filter = self.vote_filter
+        window_ready = self.window_ready
+        
+        # Resolve the channel selection once
+        channel_indices = None
+        if config.USE_CHANNELS is not None:
+            channel_indices = [ch for ch in config.USE_CHANNELS if ch < self.num_channels]
+            if len(channel_indices) == 0:
+                channel_indices = None
         
         while self.is_running:
             try:
-                # Get new data from acquisition
-                new_data = self.acquisition.get_data()
+                # Block until acquisition signals a new step; the timeout only
+                # bounds how long a stop request can go unnoticed
+                try:
+                    window_ready.get(timeout=config.STEP_SEC)
+                except queue.Empty:
+                    continue
+                
+                # Get filtered analysis window (view into the ring, no copy)
+                filtered_data = data_buffer.get_latest_view(window_samples)
                 
-                if new_data is not None and new_data.shape[1] > 0:
-                    # Add to buffer
-                    self.data_buffer.add_samples(new_data)
+                if filtered_data is not None:
+                    # Select channels if specified
+                    if channel_indices is not None:
+                        filtered_data = filtered_data[channel_indices, :]
                     
-                    # Check if it's time to process
-                    current_time = time.time()
-                    if current_time - last_process_time >= config.STEP_SEC:
-                        # Get analysis window
-                        analysis_data = self.data_buffer.get_latest_samples(window_samples)
+                    # Detect SSVEP
+                    result = detector.detect(filtered_data, return_all_scores=True)
+                    
+                    # Check SNR threshold
+                    if result['snr'] >= min_snr:
+                        # Update stable vote filter
+                        stable_decision = vote_filter.update(result['frequency'])
                         
-                        if analysis_data is not None:
-                            # Apply filters
-                            filtered_data = self.filters.apply_all(analysis_data, axis=1)
-                            
-                            # Select channels if specified
-                            if config.USE_CHANNELS is not None:
-                                channel_indices = [ch for ch in config.USE_CHANNELS 
-                                                 if ch < filtered_data.shape[0]]
-                                if len(channel_indices) > 0:
-                                    filtered_data = filtered_data[channel_indices, :]
-                            
-                            # Detect SSVEP
-                            result = self.detector.detect(filtered_data, return_all_scores=True)
-                            
-                            # Check SNR threshold
-                            if result['snr'] >= config.MIN_SNR_THRESHOLD:
-                                # Update stable vote filter
-                                stable_decision = self.vote_filter.update(result['frequency'])
-                                
-                                # Format output
-                                output = format_detection_output(
-                                    result['frequency'], 
-                                    result['snr'], 
-                                    result['all_scores'],
-                                    is_stable=(stable_decision is not None)
-                                )
-                                
-                                print(output)
-                                
-                                if stable_decision is not None:
-                                    self.last_detection_time = current_time
-                                
-                                self.detection_count += 1
-                            
-                            else:
-                                # Low SNR - reset vote filter
-                                self.vote_filter.reset()
+                        # Format output
+                        output = format_detection_output(
+                            result['frequency'], 
+                            result['snr'], 
+                            result['all_scores'],
+                            is_stable=(stable_decision is not None)
+                        )
                         
-                        last_process_time = current_time
-                
-                # Small sleep to prevent excessive CPU usage
-                time.sleep(0.01)
+                        print(output)
+                        
+                        if stable_decision is not None:
+                            self.last_detection_time = time.time()
+                        
+                        self.detection_count += 1
+                    
+                    else:
+                        # Low SNR - reset vote filter
+                        vote_filter.reset()
                 
             except Exception as e:
                 logger.error(f"Error in detection loop: {e}")
@@ -225,7 +281,31 @@ class SSVEPSystem:
         self.start_time = time.time()
         self.detection_count = 0
         
-        # Start detection thread
+        # Seed the stream filter afresh from the first chunk of this run
+        self.filters.reset_stream()
+        
+        # With many targets, score in a worker process so scoring never
+        # holds up acquisition in this interpreter
+        min_targets = config.PROCESS_SCORING_MIN_TARGETS
+        if min_targets is not None and len(config.FREQS) >= min_targets:
+            window_samples = int(config.WINDOW_SEC * self.sampling_rate)
+            self.detector.scorer = ProcessScorer(
+                dict(fs=self.sampling_rate,
+                     target_freqs=config.FREQS,
+                     harmonics=config.HARMONICS,
+                     snr_neighbor_bw=config.SNR_NEIGHBOR_BW,
+                     snr_exclude_bw=config.SNR_EXCLUDE_BW,
+                     window_samples=window_samples),
+                max_channels=self.num_channels,
+                max_samples=window_samples
+            )
+            logger.info(f"Scoring {len(config.FREQS)} targets in a worker process")
+        
+        # Start acquisition (producer) and detection (consumer) threads
+        self.acquisition_thread = threading.Thread(target=self._acquisition_loop)
+        self.acquisition_thread.daemon = True
+        self.acquisition_thread.start()
+        
         self.detection_thread = threading.Thread(target=self._detection_loop)
         self.detection_thread.daemon = True
         self.detection_thread.start()
@@ -240,9 +320,16 @@ class SSVEPSystem:
         
         self.is_running = False
         
+        if self.acquisition_thread is not None:
+            self.acquisition_thread.join(timeout=2.0)
+        
         if self.detection_thread is not None:
             self.detection_thread.join(timeout=2.0)
         
+        if self.detector is not None and self.detector.scorer is not None:
+            self.detector.scorer.close()
+            self.detector.scorer = None
+        
         logger.info("Real-time detection stopped")
     
     def stop_acquisition(self):
@@ -5,20 +5,26 @@ import numpy as np
 import time
 from pylsl import StreamInlet, resolve_streams
 from scipy import signal
-from scipy.signal import welch
-from collections import deque
+from scipy import fft as sp_fft
 import os
 import sys
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Add local src directory for utilities
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
-from utils import StableVoteFilter
+from utils import StableVoteFilter, TimeSeriesBuffer
 
 # SSVEP parameters
 TARGET_FREQS = [10.0, 15.0]  # Hz - matching binary stimulus
 HARMONICS = 2  # Include 2nd harmonic
 WINDOW_SEC = 2.0  # Analysis window
 UPDATE_RATE = 4  # Hz
+FFT_WORKERS = -1  # pocketfft threads across channels (-1 = all cores)
 
 # Detection parameters
 SNR_THRESHOLD = 2.0        # Minimum SNR for a valid detection
@@ -26,17 +32,51 @@ MARGIN_RATIO = 1.5         # Dominant frequency must exceed others by this ratio
 EMA_ALPHA = 0.3            # Exponential moving average smoothing
 HOLD_MS = 500              # Hold time for stable decisions
 
+
+def _score(psd_mean, target_idx, harmonic_idx, noise_idx, harmonics):
+    """
+    SNR of one target frequency from a channel-averaged PSD (JIT-compiled when numba is available)
+    
+    Args:
+        psd_mean: Channel-averaged PSD
+        target_idx: Bin of the target frequency
+        harmonic_idx: Bin of its 2nd harmonic
+        noise_idx: Bins of its noise band
+        harmonics: Number of harmonics to include (2 adds the 2nd harmonic at 0.3 weight)
+        
+    Returns:
+        Signal power over the median of the noise band
+    """
+    signal_power = psd_mean[target_idx]
+    if harmonics >= 2:
+        signal_power += 0.3 * psd_mean[harmonic_idx]  # Weight harmonic less
+    
+    if noise_idx.shape[0] == 0:
+        return signal_power
+    return signal_power / (np.median(psd_mean[noise_idx]) + 1e-10)
+
+
+if NUMBA_AVAILABLE:
+    _score = njit(cache=True, fastmath=True)(_score)
+
+
 class SSVEPDetectorLSL:
     def __init__(self):
         self.inlet = None
         self.fs = None
         self.n_channels = None
-        self.buffer = deque(maxlen=int(250 * WINDOW_SEC))  # Assuming ~250Hz from GUI
+        self.buffer = None  # Ring buffer, sized once the stream is known
         self.running = False
         # Smoothed power estimates for stability
         self.smoothed_powers = np.zeros(len(TARGET_FREQS))
         # Stable decision filter
         self.vote_filter = StableVoteFilter(hold_duration_ms=HOLD_MS)
+        # Filter coefficients, designed once the sampling rate is known
+        self.bp_sos = None
+        self.notch_sos = None
+        self.cascade_sos = None
+        # Streaming filter state (sections x channels x 2), set on the first chunk
+        self.cascade_zi = None
         
     def connect_lsl(self):
         """Connect to LSL stream from OpenBCI GUI"""
@@ -65,55 +105,205 @@ class SSVEPDetectorLSL:
         print(f"  - Channels: {self.n_channels}")
         print(f"  - Stream name: {info.name()}")
         
-        # Update buffer size based on actual sampling rate
-        self.buffer = deque(maxlen=int(self.fs * WINDOW_SEC))
-        
-        return True
-    
-    def compute_ssvep_power(self, data, freq, harmonics=2):
-        """Compute SSVEP power at target frequency and harmonics"""
-        # Apply bandpass filter
-        sos = signal.butter(4, [5, 45], btype='band', fs=self.fs, output='sos')
-        filtered = signal.sosfiltfilt(sos, data, axis=1)
-        
-        # Apply 60Hz notch filter for power line noise
-        notch_sos = signal.butter(2, [59, 61], btype='bandstop', fs=self.fs, output='sos')
-        filtered = signal.sosfiltfilt(notch_sos, filtered, axis=1)
-        
-        # Compute PSD with longer window for better frequency resolution
-        nperseg = min(len(filtered[0]), int(self.fs * 2))  # 2 second window
-        freqs, psd = welch(filtered, fs=self.fs, nperseg=nperseg, noverlap=nperseg//2, axis=1)
-        
         # Use occipital channels (typically channels 7-9 for O1, O2, Oz in 16-channel setup)
         # OpenBCI channel mapping: 1-8 are frontal/central, 9-16 are parietal/occipital
         if self.n_channels >= 16:
             # Use channels 8-10 (indices 7-9) for occipital region
-            psd_mean = np.mean(psd[7:10, :], axis=0)
+            self.occ_idx = slice(7, 10)
         elif self.n_channels >= 8:
             # Use last 3 channels
-            psd_mean = np.mean(psd[-3:, :], axis=0)
+            self.occ_idx = slice(self.n_channels - 3, self.n_channels)
         else:
-            psd_mean = np.mean(psd, axis=0)
-        
-        # Calculate power at target frequency
-        target_idx = np.argmin(np.abs(freqs - freq))
-        signal_power = psd_mean[target_idx]
-        
-        # Add harmonic if significant
-        if harmonics >= 2:
-            harmonic_idx = np.argmin(np.abs(freqs - freq * 2))
-            if harmonic_idx < len(psd_mean):
-                signal_power += 0.3 * psd_mean[harmonic_idx]  # Weight harmonic less
-        
-        # Calculate noise as median of surrounding frequencies
-        noise_band = np.where((freqs >= freq - 2) & (freqs <= freq + 2) & 
-                              (np.abs(freqs - freq) > 0.5))[0]
-        if len(noise_band) > 0:
-            noise_power = np.median(psd_mean[noise_band])
-            snr = signal_power / (noise_power + 1e-10)
+            self.occ_idx = slice(0, self.n_channels)
+        
+        # Preallocated ring buffer (channels x samples) sized to the analysis window
+        self.buffer = TimeSeriesBuffer(self.n_channels, WINDOW_SEC, self.fs)
+        
+        # Staging memory for one pulled chunk, viewed as a C-contiguous
+        # (channels x samples) block of the chunk's length, so the filter and
+        # ring buffer always see channel-major data
+        self._chunk_samples = 32
+        self._stage = np.empty(self.n_channels * self._chunk_samples, dtype=np.float32)
+        
+        # Design the bandpass and 60Hz notch filters for this sampling rate.
+        # The whole DSP path runs in float32 (plenty for EEG, half the
+        # memory traffic); SOS sections stay stable at that precision.
+        self.bp_sos = signal.butter(4, [5, 45], btype='band', fs=self.fs,
+                                    output='sos').astype(np.float32)
+        self.notch_sos = signal.butter(2, [59, 61], btype='bandstop', fs=self.fs,
+                                       output='sos').astype(np.float32)
+        
+        # Cascading filters is stacking their sections, so both run in one pass
+        self.cascade_sos = np.vstack([self.bp_sos, self.notch_sos])
+        
+        # Detection waits for a full window, so every PSD segment has the same
+        # length; it is zero-padded to one fast FFT length, and the bin grid,
+        # window and FFT plan are fixed from the start. Only the first
+        # nperseg columns of the staging array are ever written, so the
+        # padding stays zero.
+        self.nperseg = int(self.fs * WINDOW_SEC)
+        self._nfft = sp_fft.next_fast_len(self.nperseg, real=True)
+        self._freqs = sp_fft.rfftfreq(self._nfft, d=1.0 / self.fs)
+        self._fft_in = np.zeros((self.n_channels, self._nfft), dtype=np.float32)
+        self._window, self._scale = self._spectrum_setup()
+        
+        # Scoring bins of each target frequency on that grid, also stacked
+        # across targets (T,) and (T, noise bins) so every target is scored
+        # in one vectorised step. Noise bands clipped unevenly at the edges
+        # of the spectrum can't be stacked; those are scored one by one.
+        self._bins = {}
+        target_bins = [self._freq_bins(freq) for freq in TARGET_FREQS]
+        self.sig_idx = np.array([bins[0] for bins in target_bins], dtype=np.intp)
+        self.harm_idx = np.array([bins[1] for bins in target_bins], dtype=np.intp)
+        noise_lengths = {len(bins[2]) for bins in target_bins}
+        if len(noise_lengths) == 1 and 0 not in noise_lengths:
+            self.noise_idx = np.stack([bins[2] for bins in target_bins])
+            
+            # Positions of the middle order statistics of a noise band (two
+            # for an even count), whose mean is the band's median
+            n_noise = self.noise_idx.shape[1]
+            k = n_noise // 2
+            self._noise_kth = [k] if n_noise % 2 else [k - 1, k]
+            
+            # Per-target scratch, so combining signal, harmonic and noise
+            # allocates nothing per tick
+            self._snr_scratch = np.empty(len(TARGET_FREQS), dtype=np.float32)
+            self._harm_scratch = np.empty(len(TARGET_FREQS), dtype=np.float32)
         else:
-            snr = signal_power
+            self.noise_idx = None
+        
+        return True
+    
+    def compute_ssvep_power(self, data, freq, harmonics=2):
+        """Compute SSVEP power at target frequency and harmonics"""
+        if data.shape[1] < self.nperseg:
+            raise ValueError(f"Need at least {self.nperseg} samples, got {data.shape[1]}")
+        
+        # Only the occipital channels are scored, so only they are filtered
+        occipital = self._filter_window(data[self.occ_idx])
+        freqs, psd_mean = self._preprocess_window(occipital)
+        return self._score_freq(freqs, psd_mean, freq, harmonics)
+    
+    def _filter_window(self, data):
+        """Zero-phase bandpass and 60Hz notch filter a whole raw window"""
+        return signal.sosfiltfilt(self.cascade_sos, data, axis=1)
+    
+    def _filter_chunk(self, chunk):
+        """
+        Causally filter newly pulled samples (channels x samples), carrying
+        the filter state over to the next chunk so each sample is filtered once
+        """
+        if self.cascade_zi is None:
+            # Start the cascade in steady state for each channel's first sample
+            zi = signal.sosfilt_zi(self.cascade_sos).astype(np.float32)
+            self.cascade_zi = zi[:, None, :] * chunk[None, :, :1]
+        
+        filtered, self.cascade_zi = signal.sosfilt(self.cascade_sos, chunk, axis=1,
+                                                   zi=self.cascade_zi)
+        return filtered
+    
+    def _preprocess_window(self, occipital):
+        """
+        Compute the channel-averaged PSD of a filtered window of the occipital
+        channels (rows occ_idx) once for all target frequencies
+        """
+        freqs, psd = self._periodogram(occipital[:, -self.nperseg:])
+        
+        return freqs, np.mean(psd, axis=0)
+    
+    def _spectrum_setup(self):
+        """Build the Hann window and one-sided density scale for nperseg"""
+        window = signal.get_window('hann', self.nperseg)
+        
+        # Density scaling as in welch: DC and Nyquist are not doubled
+        scale = np.full(self._nfft // 2 + 1, 2.0 / (self.fs * np.sum(window ** 2)))
+        scale[0] /= 2
+        if self._nfft % 2 == 0:
+            scale[-1] /= 2
+        
+        # float32 so a float32 segment stays single precision end to end
+        return window.astype(np.float32), scale.astype(np.float32)
+    
+    def _periodogram(self, segment):
+        """
+        Hann-windowed PSD of one segment per channel
+        
+        The window never exceeds the segment, so welch only ever saw a
+        single segment; this is that computation without its generic setup.
+        The nperseg-long segment is zero-padded to the fixed FFT length.
+        """
+        n_rows = segment.shape[0]
+        n_samples = self.nperseg
+        
+        # Remove each channel's mean (welch's constant detrend) and window
+        # the segment into the zero-padded staging array
+        x = self._fft_in[:n_rows]
+        np.subtract(segment, segment.mean(axis=1, keepdims=True), out=x[:, :n_samples],
+                    casting='same_kind')
+        x[:, :n_samples] *= self._window
+        spectrum = sp_fft.rfft(x, axis=1, workers=FFT_WORKERS)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2) * self._scale
+        return self._freqs, psd
+    
+    def _freq_bins(self, freq):
+        """
+        Bins a target frequency is scored from: its own, its 2nd harmonic's,
+        and its noise band's ([freq - 2, freq - 0.5) and (freq + 0.5, freq + 2])
+        
+        The FFT length is fixed, so the bins are worked out once per frequency
+        by index arithmetic on the uniform grid (bin i is at i * df).
+        """
+        bins = self._bins.get(freq)
+        if bins is None:
+            df = self.fs / self._nfft
+            last = len(self._freqs) - 1
+            
+            # Bins exactly on a boundary are resolved as in exact arithmetic,
+            # up to a small tolerance for the rounding in freq / df
+            tol = 1e-9
+            
+            # Nearest bins to the target and its 2nd harmonic (ties go to the lower bin)
+            target_idx = min(int(np.ceil(freq / df - 0.5 - tol)), last)
+            harmonic_idx = min(int(np.ceil(2 * freq / df - 0.5 - tol)), last)
+            
+            lo = max(int(np.ceil((freq - 2) / df - tol)), 0)
+            inner_lo = max(int(np.ceil((freq - 0.5) / df - tol)), lo)
+            hi = min(int(np.floor((freq + 2) / df + tol)), last) + 1
+            inner_hi = min(int(np.floor((freq + 0.5) / df + tol)) + 1, hi)
+            noise_idx = np.r_[lo:inner_lo, inner_hi:hi].astype(np.intp)
+            
+            bins = (target_idx, harmonic_idx, noise_idx)
+            self._bins[freq] = bins
+        return bins
+    
+    def _score_freq(self, freqs, psd_mean, freq, harmonics=2):
+        """SNR of a target frequency (plus harmonic) against its neighbouring bins"""
+        target_idx, harmonic_idx, noise_idx = self._freq_bins(freq)
+        return float(_score(psd_mean, target_idx, harmonic_idx, noise_idx, harmonics))
+    
+    def _score_targets(self, psd_mean):
+        """
+        SNRs of all TARGET_FREQS (plus harmonic) from one channel-averaged PSD
+        
+        The stacked path returns a scratch array that the next call overwrites.
+        """
+        if self.noise_idx is None:
+            return np.array([self._score_freq(self._freqs, psd_mean, freq, HARMONICS)
+                             for freq in TARGET_FREQS])
+        
+        # Gather signal (plus weighted harmonic) straight into the scratch
+        snr = self._snr_scratch
+        np.take(psd_mean, self.sig_idx, out=snr)
+        if HARMONICS >= 2:
+            harm = np.take(psd_mean, self.harm_idx, out=self._harm_scratch)
+            harm *= 0.3  # Weight harmonic less
+            snr += harm
         
+        # Median of each noise band by selection rather than a full sort
+        part = np.partition(psd_mean[self.noise_idx], self._noise_kth, axis=1)
+        noise = part[:, self._noise_kth].mean(axis=1)
+        noise += 1e-10
+        snr /= noise
         return snr
     
     def detection_loop(self):
@@ -124,31 +314,37 @@ class SSVEPDetectorLSL:
         print("Look at LEFT (10Hz) or RIGHT (15Hz) flickering box")
         print("="*50 + "\n")
         
-        last_update = time.time()
+        # Update every UPDATE_RATE-th of a second's worth of samples; counting
+        # samples paces the loop without reading the clock
+        update_samples = self.fs / UPDATE_RATE
+        samples_since_update = 0
         
         while self.running:
             try:
                 # Pull chunk from LSL
-                chunk, timestamps = self.inlet.pull_chunk(timeout=0.0, max_samples=32)
+                chunk, timestamps = self.inlet.pull_chunk(timeout=0.0,
+                                                          max_samples=self._chunk_samples)
                 
                 if chunk:
-                    # Add to buffer
-                    for sample in chunk:
-                        self.buffer.append(sample)
+                    # Transpose the time-major samples into the staging array,
+                    # then filter only them and buffer them already filtered
+                    n_new = len(chunk)
+                    stage = self._stage[:self.n_channels * n_new].reshape(self.n_channels, n_new)
+                    np.copyto(stage, np.asarray(chunk, dtype=np.float32).T)
+                    self.buffer.add_samples(self._filter_chunk(stage))
+                    samples_since_update += n_new
                 
-                # Process at UPDATE_RATE Hz
-                if time.time() - last_update > 1.0/UPDATE_RATE and len(self.buffer) >= self.fs * 0.5:
-                    # Convert buffer to array
-                    data = np.array(self.buffer).T  # Shape: (channels, samples)
+                # Process at UPDATE_RATE Hz, once a full window is buffered
+                if samples_since_update >= update_samples and len(self.buffer) >= self.nperseg:
+                    # Latest filtered window of the occipital channels, as a view
+                    # of the ring buffer; only these channels are transformed
+                    data = self.buffer.get_latest_view(self.nperseg)[self.occ_idx]
 
-                    # Compute SSVEP power for each frequency
-                    powers = []
-                    for freq in TARGET_FREQS:
-                        power = self.compute_ssvep_power(data, freq, HARMONICS)
-                        powers.append(power)
+                    # Estimate the PSD once, then score every frequency
+                    freqs, psd_mean = self._preprocess_window(data)
+                    powers = self._score_targets(psd_mean)
 
                     # Smooth power estimates to reduce flicker
-                    powers = np.array(powers)
                     self.smoothed_powers = (
                         EMA_ALPHA * powers + (1 - EMA_ALPHA) * self.smoothed_powers
                     )
@@ -181,7 +377,7 @@ class SSVEPDetectorLSL:
                         end="",
                     )
 
-                    last_update = time.time()
+                    samples_since_update = 0
                     
             except KeyboardInterrupt:
                 break
@@ -51,13 +51,11 @@ class SSVEPStimulus:
         
         # Animation parameters
         self.frame_rate = 60.0  # Assume 60 Hz monitor
-        self.frames_per_cycle = {}
-        self.frame_counters = {}
         
-        # Calculate frames per cycle for each frequency
-        for freq in self.target_freqs:
-            self.frames_per_cycle[freq] = self.frame_rate / freq
-            self.frame_counters[freq] = 0.0
+        # Frames per cycle and frame counters, indexed like target_freqs
+        self.frames_per_cycle = [self.frame_rate / freq for freq in self.target_freqs]
+        self.frame_counters = [0] * len(self.target_freqs)
+        self._build_opacity_tables()
         
         # State
         self.is_running = False
@@ -85,8 +83,8 @@ class SSVEPStimulus:
                 logger.info(f"Detected monitor refresh rate: {self.frame_rate:.1f} Hz")
                 
                 # Recalculate frames per cycle with actual rate
-                for freq in self.target_freqs:
-                    self.frames_per_cycle[freq] = self.frame_rate / freq
+                self.frames_per_cycle = [self.frame_rate / freq for freq in self.target_freqs]
+                self._build_opacity_tables()
             
             # Calculate positions for stimuli (arranged in a grid)
             positions = self._calculate_positions()
@@ -166,39 +164,44 @@ class SSVEPStimulus:
         
         return positions[:n_stimuli]
     
-    def update_stimulus_opacity(self, freq, frame_count):
+    def _build_opacity_tables(self):
+        """Precompute one cycle of sine opacity per target, indexed by frame counter"""
+        self.opacity_tables = []
+        for fpc in self.frames_per_cycle:
+            # Counters wrap once they reach frames_per_cycle, so a cycle
+            # spans ceil(frames_per_cycle) frames
+            n_frames = int(np.ceil(fpc))
+            phases = 2 * np.pi * np.arange(n_frames) / fpc
+            self.opacity_tables.append(((np.sin(phases) + 1) / 2).tolist())
+    
+    def update_stimulus_opacity(self, index, frame_count):
         """
         Update stimulus opacity based on frame count and frequency
         
         Args:
-            freq: Target frequency
+            index: Position of the target frequency in target_freqs
             frame_count: Current frame counter for this frequency
         
         Returns:
             Opacity value (0-1)
         """
-        # Calculate phase based on frame count
-        phase = 2 * np.pi * frame_count / self.frames_per_cycle[freq]
-        
-        # Convert sine wave to opacity (0-1 range)
-        opacity = (np.sin(phase) + 1) / 2
-        
-        return opacity
+        table = self.opacity_tables[index]
+        return table[int(frame_count) % len(table)]
     
     def draw_frame(self):
         """Draw a single frame with updated stimuli"""
-        # Update frame counters
-        for freq in self.target_freqs:
-            self.frame_counters[freq] += 1.0
-            if self.frame_counters[freq] >= self.frames_per_cycle[freq]:
-                self.frame_counters[freq] = 0.0
+        # Update frame counters, wrapping at the end of each opacity table
+        counters = self.frame_counters
+        tables = self.opacity_tables
+        for i in range(len(counters)):
+            counters[i] += 1
+            if counters[i] >= len(tables[i]):
+                counters[i] = 0
         
         # Update and draw stimuli
         for i, freq in enumerate(self.target_freqs):
-            opacity = self.update_stimulus_opacity(freq, self.frame_counters[freq])
-            
-            # Set opacity
-            self.stimuli[i].opacity = opacity
+            # Set opacity from the precomputed sine cycle
+            self.stimuli[i].opacity = tables[i][counters[i]]
             
             # Highlight selected frequency
             if self.selected_frequency == freq:
@@ -271,15 +274,12 @@ class SSVEPStimulus:
         try:
             while self.is_running:
                 # Check for quit
-                keys = event.getKeys()
+                keys = event.getKeys(keyList=['escape'])
                 if 'escape' in keys:
                     break
                 
-                # Draw frame
+                # Draw frame - win.flip() blocks on vsync and paces the loop
                 self.draw_frame()
-                
-                # Small delay to prevent excessive CPU usage
-                core.wait(0.001)
         
         except KeyboardInterrupt:
             logger.info("Presentation interrupted by user")
@@ -5,7 +5,7 @@ import numpy as np
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
 from brainflow.data_filter import DataFilter
 import time
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union
 
 logger = logging.getLogger(__name__)
 
@@ -89,21 +89,43 @@ class OpenBCIAcquisition:
             logger.error(f"Failed to start streaming: {e}")
             return False
     
-    def get_data(self, num_samples: Optional[int] = None) -> Optional[np.ndarray]:
+    def get_data(self, num_samples: Optional[int] = None,
+                 timeout: float = 0.0,
+                 out: Optional[np.ndarray] = None) -> Union[np.ndarray, int, None]:
         """
         Get EEG data from the board
         
         Args:
             num_samples: Number of samples to retrieve. If None, gets all available.
+            timeout: Seconds to wait for data if none is available yet (0 returns immediately)
+            out: Optional (channels, capacity) array to write the EEG samples into.
+                At most capacity samples are read; the rest stay on the board.
         
         Returns:
-            2D numpy array of shape (channels, samples) or None if error
+            2D numpy array of shape (channels, samples) or None if error;
+            with out, the number of samples written into it (0 if none or error)
         """
+        empty = None if out is None else 0
+        
         if not self.is_streaming:
             logger.warning("Not streaming. Call start_streaming() first.")
-            return None
+            return empty
             
         try:
+            if timeout > 0:
+                # BrainFlow has no blocking read; wait in steps of a few
+                # sample periods until the board buffer has data
+                deadline = time.monotonic() + timeout
+                poll = 4.0 / self.sampling_rate
+                while self.board.get_board_data_count() == 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return empty
+                    time.sleep(min(poll, remaining))
+            
+            if out is not None:
+                num_samples = out.shape[1] if num_samples is None else min(num_samples, out.shape[1])
+            
             if num_samples is None:
                 # Get all available data
                 data = self.board.get_board_data()
@@ -112,7 +134,13 @@ class OpenBCIAcquisition:
                 data = self.board.get_board_data(num_samples)
             
             if data.shape[1] == 0:
-                return None
+                return empty
+            
+            if out is not None:
+                # Write the EEG rows straight into the caller's buffer
+                n_samples = data.shape[1]
+                out[:, :n_samples] = data[self.eeg_channels, :]
+                return n_samples
                 
             # Extract only EEG channels
             eeg_data = data[self.eeg_channels, :]
@@ -121,7 +149,7 @@ class OpenBCIAcquisition:
             
         except Exception as e:
             logger.error(f"Failed to get data: {e}")
-            return None
+            return empty
     
     def get_current_data(self, num_samples: int) -> Optional[np.ndarray]:
         """
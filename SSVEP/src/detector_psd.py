@@ -1,19 +1,81 @@
-"""PSD-based SSVEP detector using Welch's method and SNR scoring"""
+"""PSD-based SSVEP detector using targeted DFT bins and SNR scoring"""
 
 import numpy as np
 from scipy import signal
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import logging
 
+# Optional JIT for the scoring kernel
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+def _snr_kernel(data, basis_real, basis_imag, n_targets, n_harmonics, weights):
+    """
+    Harmonic-weighted SNR per target from a targeted DFT (JIT-compiled, GIL-free)
+    
+    Args:
+        data: EEG data (channels x samples)
+        basis_real: Real part of the windowed DFT basis (probes x samples)
+        basis_imag: Imaginary part of the windowed DFT basis (probes x samples)
+        n_targets: Number of target frequencies
+        n_harmonics: Number of harmonics per target
+        weights: SNR weight per harmonic
+    
+    Returns:
+        Array of SNR scores, one per target
+    """
+    n_channels, n_samples = data.shape
+    n_probes = basis_real.shape[0]
+    
+    # Channel-averaged power at every probed frequency
+    power = np.zeros(n_probes)
+    for k in range(n_probes):
+        for c in range(n_channels):
+            re = 0.0
+            im = 0.0
+            for i in range(n_samples):
+                re += basis_real[k, i] * data[c, i]
+                im += basis_imag[k, i] * data[c, i]
+            power[k] += re * re + im * im
+        power[k] /= n_channels
+    
+    # Probes are laid out per (target, harmonic): peak first, then noise bins
+    probes_per_bin = n_probes // (n_targets * n_harmonics)
+    scores = np.zeros(n_targets)
+    for t in range(n_targets):
+        for h in range(n_harmonics):
+            base = (t * n_harmonics + h) * probes_per_bin
+            noise = 0.0
+            for j in range(1, probes_per_bin):
+                noise += power[base + j]
+            noise /= probes_per_bin - 1
+            if noise > 0:
+                scores[t] += weights[h] * power[base] / noise
+    
+    return scores
+
+
+if NUMBA_AVAILABLE:
+    _snr_kernel = njit(cache=True, nogil=True)(_snr_kernel)
+
+
 class PSDDetector:
     """SSVEP detector based on Power Spectral Density and SNR calculation"""
     
+    # SNR weight of the fundamental, 2nd and 3rd harmonic
+    HARMONIC_WEIGHTS = (1.0, 0.5, 0.25)
+    
     def __init__(self, fs: float, target_freqs: List[float], 
                  harmonics: int = 2, snr_neighbor_bw: float = 1.0,
-                 snr_exclude_bw: float = 0.3):
+                 snr_exclude_bw: float = 0.3, window_samples: Optional[int] = None):
         """
         Initialize PSD-based SSVEP detector
         
@@ -23,6 +85,7 @@ class PSDDetector:
             harmonics: Number of harmonics to consider (1=fundamental only, 2=add 2nd harmonic)
             snr_neighbor_bw: Bandwidth for noise floor calculation (Hz)
             snr_exclude_bw: Exclusion zone around peak for noise calculation (Hz)
+            window_samples: Expected analysis window length, to build the DFT basis up front
         """
         self.fs = fs
         self.target_freqs = sorted(target_freqs)
@@ -30,6 +93,19 @@ class PSDDetector:
         self.snr_neighbor_bw = snr_neighbor_bw
         self.snr_exclude_bw = snr_exclude_bw
         
+        # Hann-windowed DFT basis, rebuilt whenever the window length changes
+        self._basis = None
+        self._basis_shape = None
+        self._basis_n = None
+        self._basis_real = None
+        self._basis_imag = None
+        self._harmonic_weights = None
+        if window_samples is not None:
+            self._build_basis(window_samples)
+        
+        # Optional out-of-process scorer (see ProcessScorer) used by detect
+        self.scorer = None
+        
         logger.info(f"PSD Detector initialized: freqs={target_freqs}Hz, harmonics={harmonics}")
     
     def compute_psd(self, data: np.ndarray, nperseg: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
@@ -47,17 +123,11 @@ class PSDDetector:
             # Use ~1 second windows or half the data length
             nperseg = min(int(self.fs), data.shape[-1] // 2)
         
-        if data.ndim == 1:
-            # Single channel
-            freqs, psd = signal.welch(data, fs=self.fs, nperseg=nperseg)
-        else:
+        freqs, psd = signal.welch(data, fs=self.fs, nperseg=nperseg, axis=-1)
+        
+        if data.ndim > 1:
             # Multiple channels - average PSDs
-            psds = []
-            for ch in range(data.shape[0]):
-                f, p = signal.welch(data[ch], fs=self.fs, nperseg=nperseg)
-                psds.append(p)
-            freqs = f
-            psd = np.mean(psds, axis=0)
+            psd = psd.mean(axis=0)
         
         return freqs, psd
     
@@ -112,13 +182,84 @@ class PSDDetector:
         
         return snr
     
-    def detect(self, data: np.ndarray, return_all_scores: bool = False) -> Dict:
+    def _build_basis(self, n_samples: int):
+        """
+        Precompute Hann-windowed complex exponentials for every probed frequency
+        
+        For each target frequency and harmonic this probes the peak plus the
+        same noise bins calculate_snr() uses, at the DFT resolution fs/n_samples.
+        
+        Args:
+            n_samples: Analysis window length in samples
+        """
+        n_harmonics = min(max(self.harmonics, 1), len(self.HARMONIC_WEIGHTS))
+        freq_resolution = self.fs / n_samples
+        exclude_bins = int(np.ceil(self.snr_exclude_bw / freq_resolution))
+        neighbor_bins = int(np.ceil(self.snr_neighbor_bw / freq_resolution))
+        
+        # Peak first, then the left and right noise bands
+        offsets = np.concatenate([
+            [0],
+            np.arange(-(neighbor_bins + exclude_bins), -exclude_bins),
+            np.arange(exclude_bins + 1, exclude_bins + neighbor_bins + 1)
+        ]) * freq_resolution
+        
+        centers = np.outer(self.target_freqs, np.arange(1, n_harmonics + 1))
+        probe_freqs = centers[:, :, np.newaxis] + offsets
+        
+        t = np.arange(n_samples) / self.fs
+        basis = np.exp(-2j * np.pi * probe_freqs.reshape(-1, 1) * t) * np.hanning(n_samples)
+        basis = basis.astype(np.complex64)
+        
+        self._basis = basis
+        if NUMBA_AVAILABLE:
+            self._basis_real = np.ascontiguousarray(basis.real)
+            self._basis_imag = np.ascontiguousarray(basis.imag)
+        self._basis_shape = probe_freqs.shape
+        self._basis_n = n_samples
+        self._harmonic_weights = np.array(self.HARMONIC_WEIGHTS[:n_harmonics])
+    
+    def compute_snr_scores(self, data: np.ndarray) -> np.ndarray:
+        """
+        Harmonic-weighted SNR for every target frequency from a targeted DFT
+        
+        Args:
+            data: EEG data (samples) or (channels x samples)
+        
+        Returns:
+            Array of SNR scores, one per entry of target_freqs
+        """
+        if self._basis_n != data.shape[-1]:
+            self._build_basis(data.shape[-1])
+        
+        if NUMBA_AVAILABLE:
+            n_targets, n_harmonics, _ = self._basis_shape
+            return _snr_kernel(np.atleast_2d(data), self._basis_real, self._basis_imag,
+                               n_targets, n_harmonics, self._harmonic_weights)
+        
+        # One matrix product gives every probed bin for every channel
+        coeffs = self._basis @ np.asarray(data, dtype=np.float32).T
+        power = np.abs(coeffs) ** 2
+        if power.ndim > 1:
+            power = power.mean(axis=1)
+        power = power.reshape(self._basis_shape)
+        
+        signal_power = power[:, :, 0]
+        noise_power = power[:, :, 1:].mean(axis=2)
+        snr = np.divide(signal_power, noise_power,
+                        out=np.zeros_like(signal_power), where=noise_power > 0)
+        
+        return snr @ self._harmonic_weights
+    
+    def detect(self, data: np.ndarray, return_all_scores: bool = False,
+               return_psd: bool = False) -> Dict:
         """
         Detect SSVEP frequency from EEG data
         
         Args:
             data: EEG data (samples) or (channels x samples)
             return_all_scores: If True, return SNR scores for all frequencies
+            return_psd: If True, also compute the full Welch PSD for visualization
         
         Returns:
             Dictionary with detection results:
@@ -126,42 +267,23 @@ class PSDDetector:
                 - 'snr': SNR of detected frequency
                 - 'confidence': Detection confidence (0-1)
                 - 'all_scores': Dict of freq->SNR (if return_all_scores=True)
-                - 'psd': Tuple of (freqs, psd) for visualization
+                - 'psd': Tuple of (freqs, psd) (if return_psd=True)
         """
-        # Compute PSD
-        freqs, psd = self.compute_psd(data)
-        
         # Calculate SNR for each target frequency
-        snr_scores = {}
-        
-        for target_freq in self.target_freqs:
-            # Calculate SNR for fundamental
-            snr_fundamental = self.calculate_snr(freqs, psd, target_freq)
-            
-            # Calculate SNR for harmonics if enabled
-            total_snr = snr_fundamental
-            
-            if self.harmonics >= 2:
-                # Add 2nd harmonic
-                snr_2nd = self.calculate_snr(freqs, psd, 2 * target_freq)
-                total_snr += 0.5 * snr_2nd  # Weight 2nd harmonic less
-            
-            if self.harmonics >= 3:
-                # Add 3rd harmonic
-                snr_3rd = self.calculate_snr(freqs, psd, 3 * target_freq)
-                total_snr += 0.25 * snr_3rd  # Weight 3rd harmonic even less
-            
-            snr_scores[target_freq] = total_snr
+        scorer = self.scorer if self.scorer is not None else self
+        scores = scorer.compute_snr_scores(data)
+        snr_scores = dict(zip(self.target_freqs, scores.tolist()))
         
         # Find frequency with highest SNR
-        best_freq = max(snr_scores.keys(), key=lambda f: snr_scores[f])
+        best_idx = int(np.argmax(scores))
+        best_freq = self.target_freqs[best_idx]
         best_snr = snr_scores[best_freq]
         
         # Calculate confidence based on SNR difference to second best
-        sorted_scores = sorted(snr_scores.values(), reverse=True)
-        if len(sorted_scores) > 1 and sorted_scores[1] > 0:
+        second_snr = float(np.partition(scores, -2)[-2]) if len(scores) > 1 else 0.0
+        if second_snr > 0:
             # Confidence based on ratio of best to second best
-            confidence = 1.0 - (sorted_scores[1] / sorted_scores[0])
+            confidence = 1.0 - (second_snr / best_snr)
         else:
             confidence = 1.0 if best_snr > 1.5 else best_snr / 1.5
         
@@ -169,10 +291,12 @@ class PSDDetector:
         result = {
             'frequency': best_freq,
             'snr': best_snr,
-            'confidence': np.clip(confidence, 0.0, 1.0),
-            'psd': (freqs, psd)
+            'confidence': np.clip(confidence, 0.0, 1.0)
         }
         
+        if return_psd:
+            result['psd'] = self.compute_psd(data)
+        
         if return_all_scores:
             result['all_scores'] = snr_scores
         
@@ -215,6 +339,78 @@ class PSDDetector:
         return result
 
 
+# Detector owned by a ProcessScorer worker process
+_worker_detector = None
+
+
+def _init_score_worker(detector_kwargs: Dict[str, Any]):
+    """Build the worker process's own detector (and its DFT basis) once"""
+    global _worker_detector
+    _worker_detector = PSDDetector(**detector_kwargs)
+
+
+def _score_shared_window(shm_name: str, shape: Tuple[int, int]) -> np.ndarray:
+    """Score the window a ProcessScorer left in shared memory"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        window = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        return _worker_detector.compute_snr_scores(window)
+    finally:
+        shm.close()
+
+
+class ProcessScorer:
+    """
+    Compute SNR scores in a worker process instead of the calling thread
+    
+    The window is copied into a shared-memory slot and only its shape
+    crosses the process boundary, so the caller's interpreter (and any
+    acquisition thread in it) is not held up by scoring. Worth it only when
+    many targets make scoring expensive.
+    """
+    
+    def __init__(self, detector_kwargs: Dict[str, Any], max_channels: int, max_samples: int):
+        """
+        Start the worker process
+        
+        Args:
+            detector_kwargs: PSDDetector arguments for the worker's detector
+            max_channels: Largest number of channels a window can have
+            max_samples: Largest number of samples a window can have
+        """
+        self._max_shape = (max_channels, max_samples)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max_channels * max_samples * np.dtype(np.float32).itemsize)
+        self._executor = ProcessPoolExecutor(max_workers=1, initializer=_init_score_worker,
+                                             initargs=(detector_kwargs,))
+    
+    def compute_snr_scores(self, data: np.ndarray) -> np.ndarray:
+        """
+        Harmonic-weighted SNR for every target frequency, computed by the worker
+        
+        Args:
+            data: EEG data (samples) or (channels x samples)
+        
+        Returns:
+            Array of SNR scores, one per target frequency
+        """
+        data = np.atleast_2d(data)
+        if data.shape[0] > self._max_shape[0] or data.shape[1] > self._max_shape[1]:
+            raise ValueError(f"Window of shape {data.shape} exceeds {self._max_shape}")
+        
+        # One window in flight at a time, so a single slot is enough
+        slot = np.ndarray(data.shape, dtype=np.float32, buffer=self._shm.buf)
+        np.copyto(slot, data)
+        future = self._executor.submit(_score_shared_window, self._shm.name, data.shape)
+        return future.result()
+    
+    def close(self):
+        """Stop the worker process and release the shared memory"""
+        self._executor.shutdown(wait=True)
+        self._shm.close()
+        self._shm.unlink()
+
+
 def test_detector():
     """Test the PSD detector with synthetic SSVEP signal"""
     import matplotlib.pyplot as plt
@@ -245,7 +441,7 @@ def test_detector():
     detector = PSDDetector(fs=fs, target_freqs=target_freqs, harmonics=2)
     
     # Detect SSVEP
-    result = detector.detect(eeg_signal, return_all_scores=True)
+    result = detector.detect(eeg_signal, return_all_scores=True, return_psd=True)
     
     # Print results
     print(f"True frequency: {true_freq} Hz")
@@ -35,6 +35,15 @@ class SSVEPFilters:
         if notch_freq is not None:
             self.sos_notch = self._design_notch(notch_freq, notch_q)
         
+        # Bandpass and notch cascaded as one set of sections for apply_stream(),
+        # so a single state seeded from the input covers both filters
+        self._sos_stream = self.sos_bandpass
+        if self.sos_notch is not None:
+            self._sos_stream = np.vstack([self.sos_bandpass, self.sos_notch])
+        
+        # Persistent filter state for apply_stream()
+        self._zi_stream = None
+        
         logger.info(f"Filters initialized: fs={fs}Hz, bandpass={bandpass}Hz, notch={notch_freq}Hz")
     
     def _design_bandpass(self, lowcut: float, highcut: float, order: int = 4) -> np.ndarray:
@@ -132,6 +141,32 @@ class SSVEPFilters:
         
         return filtered
     
+    def reset_stream(self):
+        """Forget the filter state kept by apply_stream()"""
+        self._zi_stream = None
+    
+    def apply_stream(self, data: np.ndarray) -> np.ndarray:
+        """
+        Causally filter newly arrived samples, carrying filter state across calls
+        
+        Each call only filters the new samples, so overlapping analysis windows
+        never get re-filtered. The cascade's state is seeded from the first
+        sample of the first chunk to avoid a start-up transient.
+        
+        Args:
+            data: New data samples (channels x samples)
+        
+        Returns:
+            Filtered samples (channels x samples)
+        """
+        if self._zi_stream is None:
+            x0 = data[:, 0][np.newaxis, :, np.newaxis]
+            self._zi_stream = signal.sosfilt_zi(self._sos_stream)[:, np.newaxis, :] * x0
+        
+        filtered, self._zi_stream = signal.sosfilt(self._sos_stream, data, axis=1,
+                                                   zi=self._zi_stream)
+        return filtered
+    
     def filter_online(self, data: np.ndarray, zi_bp=None, zi_notch=None):
         """
         Apply filters for online/real-time processing with filter states
@@ -2,7 +2,7 @@
 
 import numpy as np
 import time
-from typing import Optional, Dict
+from typing import Optional, Dict, Union
 import threading
 import logging
 
@@ -26,7 +26,8 @@ class SyntheticSSVEPGenerator:
         self.current_frequency = None
         self.thread = None
         self.buffer = []
-        self.buffer_lock = threading.Lock()
+        # Guards the buffer and wakes get_data(timeout=...) when a chunk arrives
+        self.buffer_lock = threading.Condition()
         
         # Signal parameters
         self.snr = 3.0  # Signal-to-noise ratio
@@ -114,6 +115,8 @@ class SyntheticSSVEPGenerator:
                 # Keep buffer size reasonable
                 if len(self.buffer) > 50:  # ~2 seconds at 40ms chunks
                     self.buffer.pop(0)
+                
+                self.buffer_lock.notify_all()
             
             # Sleep to maintain realistic timing
             time.sleep(chunk_size / self.fs)
@@ -137,14 +140,39 @@ class SyntheticSSVEPGenerator:
                 self.thread.join()
             logger.info("Stopped synthetic data streaming")
     
-    def get_data(self) -> Optional[np.ndarray]:
+    def get_data(self, timeout: float = 0.0,
+                 out: Optional[np.ndarray] = None) -> Union[np.ndarray, int, None]:
         """
         Get available synthetic data
         
+        Args:
+            timeout: Seconds to wait for data if none is buffered (0 returns immediately)
+            out: Optional (n_channels, capacity) array to copy samples into.
+                Samples that don't fit stay buffered for the next call.
+        
         Returns:
-            Array of shape (n_channels, n_samples) or None if no data
+            Array of shape (n_channels, n_samples) or None if no data;
+            with out, the number of samples written into it
         """
         with self.buffer_lock:
+            if len(self.buffer) == 0 and timeout > 0:
+                self.buffer_lock.wait_for(lambda: len(self.buffer) > 0, timeout)
+            
+            if out is not None:
+                # Copy chunks in arrival order, splitting the last one if needed
+                capacity = out.shape[1]
+                n_copied = 0
+                while self.buffer and n_copied < capacity:
+                    chunk = self.buffer[0]
+                    n = min(chunk.shape[1], capacity - n_copied)
+                    out[:, n_copied:n_copied + n] = chunk[:, :n]
+                    if n == chunk.shape[1]:
+                        self.buffer.pop(0)
+                    else:
+                        self.buffer[0] = chunk[:, n:]
+                    n_copied += n
+                return n_copied
+            
             if len(self.buffer) == 0:
                 return None
             
@@ -87,7 +87,13 @@ class RingBuffer:
 
 
 class TimeSeriesBuffer:
-    """Ring buffer specifically for time series data (e.g., EEG)"""
+    """Ring buffer specifically for time series data (e.g., EEG)
+    
+    Safe without a lock for one producer thread (add_samples) and one
+    consumer thread (get_latest_*): the producer writes the samples first
+    and then publishes them by bumping a single write counter, and the
+    consumer only ever reads that counter once per call.
+    """
     
     def __init__(self, n_channels: int, buffer_duration: float, sampling_rate: float):
         """
@@ -102,15 +108,32 @@ class TimeSeriesBuffer:
         self.sampling_rate = sampling_rate
         self.buffer_size = int(buffer_duration * sampling_rate)
         
-        # Initialize buffer array
-        self.data = np.zeros((n_channels, self.buffer_size))
-        self.write_idx = 0
-        self.is_full = False
-        self.lock = threading.Lock()
+        # Initialize buffer array (float32 halves memory traffic; EEG needs no
+        # more precision). Every sample is written twice (at i and
+        # i + buffer_size) so the latest window is always one contiguous slice.
+        self._backing = np.zeros((n_channels, 2 * self.buffer_size), dtype=np.float32)
+        self.data = self._backing[:, :self.buffer_size]
+        
+        # Total samples ever written; the only state shared between threads
+        self._n_written = 0
         
         logger.info(f"TimeSeriesBuffer initialized: {n_channels} channels, "
                    f"{buffer_duration}s @ {sampling_rate}Hz = {self.buffer_size} samples")
     
+    @property
+    def write_idx(self) -> int:
+        """Index of the next sample to be written"""
+        return self._n_written % self.buffer_size
+    
+    @property
+    def is_full(self) -> bool:
+        """Whether the buffer has wrapped at least once"""
+        return self._n_written >= self.buffer_size
+    
+    def __len__(self) -> int:
+        """Number of valid samples currently held"""
+        return min(self._n_written, self.buffer_size)
+    
     def add_samples(self, samples: np.ndarray):
         """
         Add new samples to the buffer
@@ -122,24 +145,85 @@ class TimeSeriesBuffer:
             raise ValueError(f"Expected {self.n_channels} channels, got {samples.shape[0]}")
         
         n_new_samples = samples.shape[1]
+        size = self.buffer_size
+        write_idx = self._n_written % size
         
-        with self.lock:
-            # Handle wraparound
-            if self.write_idx + n_new_samples <= self.buffer_size:
-                # No wraparound needed
-                self.data[:, self.write_idx:self.write_idx + n_new_samples] = samples
-            else:
-                # Wraparound needed
-                n_before_wrap = self.buffer_size - self.write_idx
-                n_after_wrap = n_new_samples - n_before_wrap
-                
-                self.data[:, self.write_idx:] = samples[:, :n_before_wrap]
-                self.data[:, :n_after_wrap] = samples[:, n_before_wrap:]
-                
-                self.is_full = True
+        # Handle wraparound
+        if write_idx + n_new_samples <= size:
+            # No wraparound needed
+            end = write_idx + n_new_samples
+            self._backing[:, write_idx:end] = samples
+            self._backing[:, write_idx + size:end + size] = samples
+        else:
+            # Wraparound needed
+            n_before_wrap = size - write_idx
+            n_after_wrap = n_new_samples - n_before_wrap
             
-            # Update write index
-            self.write_idx = (self.write_idx + n_new_samples) % self.buffer_size
+            self._backing[:, write_idx:size] = samples[:, :n_before_wrap]
+            self._backing[:, write_idx + size:] = samples[:, :n_before_wrap]
+            self._backing[:, :n_after_wrap] = samples[:, n_before_wrap:]
+            self._backing[:, size:size + n_after_wrap] = samples[:, n_before_wrap:]
+        
+        # Publish the new samples to the consumer
+        self._n_written += n_new_samples
+    
+    def reserve_write(self, n_samples: int) -> np.ndarray:
+        """
+        Get a writable view of the next free slots, so a producer can fill
+        the buffer in place instead of handing over a new array
+        
+        The view stops at the wrap point, so it may be shorter than requested.
+        Nothing written into it is visible to readers until commit_write().
+        
+        Args:
+            n_samples: Maximum number of samples to reserve
+        
+        Returns:
+            Array view of shape (n_channels, <= n_samples)
+        """
+        write_idx = self._n_written % self.buffer_size
+        end = write_idx + min(n_samples, self.buffer_size - write_idx)
+        return self._backing[:, write_idx:end]
+    
+    def commit_write(self, n_samples: int):
+        """
+        Publish samples written into the view returned by reserve_write()
+        
+        Args:
+            n_samples: Number of samples written at the start of the view
+        """
+        size = self.buffer_size
+        write_idx = self._n_written % size
+        end = write_idx + n_samples
+        
+        if end > size:
+            raise ValueError(f"Cannot commit {n_samples} samples past the wrap point")
+        
+        # Mirror into the second copy, then publish
+        self._backing[:, write_idx + size:end + size] = self._backing[:, write_idx:end]
+        self._n_written += n_samples
+    
+    def get_latest_view(self, n_samples: int) -> Optional[np.ndarray]:
+        """
+        Get the most recent N samples as a zero-copy view
+        
+        The view aliases the internal buffer: it stays valid until the producer
+        has written another (buffer_size - n_samples) samples, so it must be
+        consumed (or copied) well within that time.
+        
+        Args:
+            n_samples: Number of samples to retrieve
+        
+        Returns:
+            Array view of shape (n_channels, n_samples) or None if not enough data
+        """
+        n_written = self._n_written
+        
+        if n_samples > min(n_written, self.buffer_size):
+            return None
+        
+        end = n_written % self.buffer_size + self.buffer_size
+        return self._backing[:, end - n_samples:end]
     
     def get_latest_samples(self, n_samples: int) -> Optional[np.ndarray]:
         """
@@ -151,32 +235,8 @@ class TimeSeriesBuffer:
         Returns:
             Array of shape (n_channels, n_samples) or None if not enough data
         """
-        with self.lock:
-            available = self.buffer_size if self.is_full else self.write_idx
-            
-            if n_samples > available:
-                return None
-            
-            # Calculate start index
-            if self.is_full:
-                start_idx = (self.write_idx - n_samples) % self.buffer_size
-            else:
-                start_idx = max(0, self.write_idx - n_samples)
-            
-            # Extract data
-            if start_idx + n_samples <= self.buffer_size:
-                # No wraparound
-                return self.data[:, start_idx:start_idx + n_samples].copy()
-            else:
-                # Wraparound needed
-                n_before_wrap = self.buffer_size - start_idx
-                n_after_wrap = n_samples - n_before_wrap
-                
-                result = np.zeros((self.n_channels, n_samples))
-                result[:, :n_before_wrap] = self.data[:, start_idx:]
-                result[:, n_before_wrap:] = self.data[:, :n_after_wrap]
-                
-                return result
+        view = self.get_latest_view(n_samples)
+        return None if view is None else view.copy()
     
     def get_latest_duration(self, duration: float) -> Optional[np.ndarray]:
         """
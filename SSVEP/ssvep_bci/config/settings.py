@@ -70,6 +70,7 @@ CLASSIFIER = {
         'enabled': True,
         'n_filters': 5,
         'filter_order': 4,
+        'causal': True,  # Single forward pass on live windows instead of zero-phase filtfilt
     },
     'window_length': 4.0,  # seconds - analysis window
     'window_overlap': 0.5,  # Overlap ratio for sliding window
@@ -87,6 +88,7 @@ FEATURES = {
         'window_function': 'hann',
         'nperseg': 250,  # Samples per segment for Welch's method
         'noverlap': 125,  # Overlap samples
+        'use_welch': False,  # Compute the full Welch PSD instead of only the target bins (debugging)
     },
     'msi': {
         'n_cycles': 5,  # Number of cycles for template
@@ -15,7 +15,6 @@ from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
 from brainflow.data_filter import DataFilter
 import mne
 from typing import Optional, Tuple, List, Dict, Any
-from collections import deque
 
 
 class SSVEPAcquisition:
@@ -37,14 +36,25 @@ class SSVEPAcquisition:
         self.recording = False
         
         # Data buffers
-        self.data_buffer = queue.Queue(maxsize=10000)
         self.marker_buffer = queue.Queue(maxsize=1000)
         self.raw_data = []
         self.markers = []
         
-        # Circular buffer for real-time processing
-        buffer_size = config['REALTIME']['buffer_size']
-        self.circular_buffer = deque(maxlen=buffer_size)
+        # Circular buffer for real-time processing: preallocated sample rings
+        # (the EEG ring is sized on the first block, once the channel count is known).
+        # EEG is kept as float32 for the DSP path; timestamps need float64.
+        self.buffer_size = config['REALTIME']['buffer_size']
+        self.ring_eeg = None
+        self.ring_timestamps = np.zeros(self.buffer_size)
+        self.ring_index = 0
+        self.ring_count = 0
+        self.ring_lock = threading.Lock()
+        
+        # Optional causal filter applied to each block as it arrives (e.g.
+        # SSVEPPreprocessor.filter_chunk); its output fills a second ring so
+        # windows can be read pre-filtered
+        self.chunk_filter = None
+        self.ring_filtered = None
         
         # Threading
         self.stream_thread = None
@@ -64,8 +74,8 @@ class SSVEPAcquisition:
         self.data_dir = Path(config['DATA_STORAGE']['data_dir'])
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
-        # Real-time data access
-        self.latest_data_lock = threading.Lock()
+        # Real-time data access: the stream worker swaps in a new sample
+        # dict (never mutated afterwards), so readers need no lock
         self.latest_data = None
         
     def initialize_board(self, serial_port: Optional[str] = None) -> bool:
@@ -207,61 +217,122 @@ class SSVEPAcquisition:
                     # Update sample count
                     self.sample_count += data.shape[1]
                     
-                    # Store in buffers
-                    for i in range(data.shape[1]):
-                        sample = {
-                            'timestamp': timestamps[i],
-                            'eeg': eeg_data[:, i],
-                            'marker': markers[i]
-                        }
-                        
-                        # Add to circular buffer for real-time access
-                        self.circular_buffer.append(sample)
-                        
-                        # Update latest data for real-time processing
-                        with self.latest_data_lock:
-                            self.latest_data = sample
-                        
-                        try:
-                            self.data_buffer.put_nowait(sample)
-                            
-                            # Store for recording
-                            if self.recording:
-                                self.raw_data.append(sample)
-                                
-                        except queue.Full:
-                            # Buffer full, remove oldest sample
-                            self.data_buffer.get()
-                            self.data_buffer.put_nowait(sample)
+                    # Add the block to the circular buffer for real-time access
+                    self._write_ring(eeg_data, timestamps)
+                    
+                    # Store per-sample records only while recording
+                    if self.recording:
+                        self.raw_data.extend(
+                            {'timestamp': timestamps[i],
+                             'eeg': eeg_data[:, i],
+                             'marker': markers[i]}
+                            for i in range(data.shape[1])
+                        )
+                    
+                    # Publish the newest sample for real-time feedback
+                    self.latest_data = {
+                        'timestamp': timestamps[-1],
+                        'eeg': eeg_data[:, -1],
+                        'marker': markers[-1]
+                    }
                 
                 time.sleep(0.001)  # Smaller delay for better real-time performance
                 
             except Exception as e:
                 print(f"Stream worker error: {e}")
     
-    def get_realtime_data(self, window_length: float) -> Tuple[np.ndarray, np.ndarray]:
+    def get_realtime_data(self, window_length: float,
+                          filtered: bool = False) -> Tuple[np.ndarray, np.ndarray]:
         """
         Get real-time data for SSVEP processing
         
         Args:
             window_length: Length of data window in seconds
+            filtered: Read the output of chunk_filter instead of the raw EEG
             
         Returns:
             Tuple of (eeg_data, timestamps)
         """
+        if filtered and self.chunk_filter is None:
+            raise ValueError("No chunk_filter set; filtered data is not available")
+        
         n_samples = int(window_length * self.sampling_rate)
         
-        # Get recent samples from circular buffer
-        recent_samples = list(self.circular_buffer)[-n_samples:]
+        with self.ring_lock:
+            n_samples = min(n_samples, self.ring_count)
+            if n_samples == 0:
+                return np.array([]), np.array([])
+            
+            ring = self.ring_filtered if filtered else self.ring_eeg
+            
+            # Copy the most recent samples out in order, in at most two slices
+            start = (self.ring_index - n_samples) % self.buffer_size
+            end = start + n_samples
+            if end <= self.buffer_size:
+                eeg_data = ring[:, start:end].copy()
+                timestamps = self.ring_timestamps[start:end].copy()
+            else:
+                end -= self.buffer_size
+                eeg_data = np.concatenate((ring[:, start:], ring[:, :end]), axis=1)
+                timestamps = np.concatenate((self.ring_timestamps[start:], self.ring_timestamps[:end]))
         
-        if not recent_samples:
-            return np.array([]), np.array([])
+        return eeg_data, timestamps
+    
+    def _write_ring(self, eeg_data: np.ndarray, timestamps: np.ndarray):
+        """
+        Append a block of samples to the real-time circular buffer
         
-        # Convert to arrays
-        eeg_data = np.array([s['eeg'] for s in recent_samples]).T
-        timestamps = np.array([s['timestamp'] for s in recent_samples])
+        Args:
+            eeg_data: EEG block (channels x samples)
+            timestamps: Timestamp of each sample
+        """
+        # Every sample goes through the filter so its state stays continuous
+        rings = [eeg_data]
+        if self.chunk_filter is not None:
+            rings.append(self.chunk_filter(eeg_data))
+        
+        n_samples = len(timestamps)
+        if n_samples > self.buffer_size:
+            # Only the newest buffer_size samples can survive
+            rings = [block[:, -self.buffer_size:] for block in rings]
+            timestamps = timestamps[-self.buffer_size:]
+            n_samples = self.buffer_size
+        
+        with self.ring_lock:
+            n_channels = eeg_data.shape[0]
+            if self.ring_eeg is None or self.ring_eeg.shape[0] != n_channels:
+                self.ring_eeg = np.zeros((n_channels, self.buffer_size), dtype=np.float32)
+                self.ring_filtered = None
+                self.ring_index = 0
+                self.ring_count = 0
+            if len(rings) > 1 and self.ring_filtered is None:
+                self.ring_filtered = np.zeros_like(self.ring_eeg)
+            
+            start = self.ring_index
+            self._ring_store(self.ring_eeg, start, rings[0])
+            self._ring_store(self.ring_timestamps, start, timestamps)
+            if len(rings) > 1:
+                self._ring_store(self.ring_filtered, start, rings[1])
+            
+            self.ring_index = (start + n_samples) % self.buffer_size
+            self.ring_count = min(self.ring_count + n_samples, self.buffer_size)
+    
+    def _ring_store(self, ring: np.ndarray, start: int, block: np.ndarray):
+        """
+        Copy a block into a ring along its last axis, wrapping around the end
         
-        return eeg_data, timestamps
+        Args:
+            ring: Ring array (... x buffer_size)
+            start: Write position
+            block: Samples to store (... x n_samples)
+        """
+        end = start + block.shape[-1]
+        if end <= self.buffer_size:
+            ring[..., start:end] = block
+        else:
+            split = self.buffer_size - start
+            ring[..., start:] = block[..., :split]
+            ring[..., :end - self.buffer_size] = block[..., split:]
     
     def get_latest_sample(self) -> Optional[Dict]:
         """
@@ -270,8 +341,8 @@ class SSVEPAcquisition:
         Returns:
             Latest sample dict or None
         """
-        with self.latest_data_lock:
-            return self.latest_data.copy() if self.latest_data else None
+        sample = self.latest_data
+        return sample.copy() if sample else None
     
     def insert_marker(self, marker_code: int, timestamp: Optional[float] = None):
         """
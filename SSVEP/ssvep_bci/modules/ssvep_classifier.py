@@ -4,13 +4,70 @@ Implements CCA, FBCCA, and PSDA methods for SSVEP detection
 """
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy import signal
 from scipy.stats import pearsonr
-from sklearn.cross_decomposition import CCA
 from typing import Dict, List, Tuple, Optional, Any
 import warnings
 warnings.filterwarnings('ignore')
 
+# Optional JIT for the PSDA Goertzel kernel
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _goertzel_power(data, nperseg, step, window, coeffs, out):
+    """
+    Welch-style power at selected bins via the Goertzel recurrence (JIT-compiled, GIL-free)
+    
+    Args:
+        data: EEG data (channels x samples)
+        nperseg: Segment length
+        step: Hop between segment starts (nperseg - noverlap)
+        window: Segment window (nperseg,)
+        coeffs: Goertzel coefficient 2*cos(2*pi*k/nperseg) per bin
+        out: Output array, filled with the unscaled power per bin averaged
+             over channels and segments
+    """
+    n_channels, n_samples = data.shape
+    n_bins = coeffs.shape[0]
+    n_segments = (n_samples - nperseg) // step + 1
+    s1 = np.empty(n_bins)
+    s2 = np.empty(n_bins)
+    
+    out[:] = 0.0
+    for c in range(n_channels):
+        for seg in range(n_segments):
+            start = seg * step
+            
+            # Constant detrend, as Welch does per segment
+            mean = 0.0
+            for i in range(nperseg):
+                mean += data[c, start + i]
+            mean /= nperseg
+            
+            # Run every bin's recurrence side by side over the segment
+            s1[:] = 0.0
+            s2[:] = 0.0
+            for i in range(nperseg):
+                x = (data[c, start + i] - mean) * window[i]
+                for k in range(n_bins):
+                    s0 = x + coeffs[k] * s1[k] - s2[k]
+                    s2[k] = s1[k]
+                    s1[k] = s0
+            
+            for k in range(n_bins):
+                out[k] += s1[k] * s1[k] + s2[k] * s2[k] - coeffs[k] * s1[k] * s2[k]
+    
+    out /= n_channels * n_segments
+
+
+if NUMBA_AVAILABLE:
+    _goertzel_power = njit(cache=True, nogil=True)(_goertzel_power)
+
 
 class SSVEPClassifier:
     """
@@ -35,6 +92,7 @@ class SSVEPClassifier:
         self.use_filter_bank = config['CLASSIFIER']['filter_bank']['enabled']
         self.n_filters = config['CLASSIFIER']['filter_bank']['n_filters']
         self.filter_order = config['CLASSIFIER']['filter_bank']['filter_order']
+        self.causal_filter_bank = config['CLASSIFIER']['filter_bank'].get('causal', False)
         
         # Classification method
         self.method = config['CLASSIFIER']['type']
@@ -43,6 +101,16 @@ class SSVEPClassifier:
         self.reference_signals = {}
         self._generate_reference_signals()
         
+        # Welch settings for PSDA; the harmonic bins are resolved on first use
+        self.psda_nperseg = config['FEATURES']['psda']['nperseg']
+        self.psda_noverlap = config['FEATURES']['psda']['noverlap']
+        self.psda_use_welch = config['FEATURES']['psda'].get('use_welch', False)
+        self._psda_plans = {}
+        if NUMBA_AVAILABLE and self.method in ('PSDA', 'ensemble'):
+            # Compile the Goertzel kernel now rather than on the first detection
+            self._psda_targeted_power(np.zeros((1, 1, self.psda_nperseg), dtype=np.float32),
+                                      self._psda_plan(self.psda_nperseg))
+        
         # Filter bank filters
         self.filter_bank = None
         if self.use_filter_bank:
@@ -66,10 +134,21 @@ class SSVEPClassifier:
                 refs.append(np.cos(2 * np.pi * harmonic * freq * t))
             
             self.reference_signals[freq] = np.array(refs).T
+        
+        # Orthonormal bases of the centered references, side by side
+        # (samples x n_freqs*2*n_harmonics). Only the EEG side of CCA changes
+        # between windows, so the reference half is whitened once here.
+        bases = []
+        for freq in self.frequencies:
+            refs = self.reference_signals[freq]
+            q, _ = np.linalg.qr(refs - refs.mean(axis=0))
+            bases.append(q)
+        self.reference_bases = np.hstack(bases)
     
     def _create_filter_bank(self):
         """Create filter bank for FBCCA"""
         self.filter_bank = []
+        self.filter_bank_zi = []
         
         # Define sub-band ranges
         for i in range(self.n_filters):
@@ -77,13 +156,15 @@ class SSVEPClassifier:
             low_freq = 6 + i * 8
             high_freq = min(14 + i * 8, 45)
             
-            # Create bandpass filter
+            # Create bandpass filter, stored in float32 so float32 EEG is
+            # filtered without being upcast (float64 input stays float64)
             sos = signal.butter(self.filter_order, 
                               [low_freq, high_freq], 
                               btype='band', 
                               fs=self.fs, 
                               output='sos')
-            self.filter_bank.append(sos)
+            self.filter_bank.append(sos.astype(np.float32))
+            self.filter_bank_zi.append(signal.sosfilt_zi(sos).astype(np.float32))
     
     def extract_features(self, eeg_data: np.ndarray) -> Dict[str, float]:
         """
@@ -95,174 +176,260 @@ class SSVEPClassifier:
         Returns:
             Dictionary of features for each frequency
         """
-        features = {}
+        scores = self.extract_features_batch(eeg_data[np.newaxis])[0]
+        return dict(zip(self.frequencies, scores.tolist()))
+    
+    def extract_features_batch(self, eeg_segments: np.ndarray) -> np.ndarray:
+        """
+        Extract SSVEP features from a stack of equally long EEG segments
         
+        Args:
+            eeg_segments: EEG data (segments x channels x samples)
+            
+        Returns:
+            Feature array (segments x frequencies), columns in self.frequencies order
+        """
         if self.method == 'CCA':
-            features = self._cca_features(eeg_data)
+            return self._cca_features(eeg_segments)
         elif self.method == 'FBCCA':
-            features = self._fbcca_features(eeg_data)
+            return self._fbcca_features(eeg_segments)
         elif self.method == 'PSDA':
-            features = self._psda_features(eeg_data)
+            return self._psda_features(eeg_segments)
         elif self.method == 'ensemble':
-            # Combine multiple methods
-            cca_features = self._cca_features(eeg_data)
-            psda_features = self._psda_features(eeg_data)
-            
-            # Weighted combination
-            for freq in self.frequencies:
-                features[freq] = 0.7 * cca_features.get(freq, 0) + 0.3 * psda_features.get(freq, 0)
+            # Weighted combination of multiple methods
+            return 0.7 * self._cca_features(eeg_segments) + 0.3 * self._psda_features(eeg_segments)
         
-        return features
+        return np.zeros((len(eeg_segments), 0))
     
-    def _cca_features(self, eeg_data: np.ndarray) -> Dict[str, float]:
+    def _cca_features(self, eeg_segments: np.ndarray) -> np.ndarray:
         """
         Extract features using Canonical Correlation Analysis
         
         Args:
-            eeg_data: EEG data (channels x samples)
+            eeg_segments: EEG data (segments x channels x samples)
             
         Returns:
-            CCA coefficients for each frequency
+            CCA coefficients (segments x frequencies)
         """
-        features = {}
+        n_segments = len(eeg_segments)
+        features = np.zeros((n_segments, len(self.frequencies)))
         
-        # Ensure correct shape
-        if eeg_data.shape[1] < eeg_data.shape[0]:
-            eeg_data = eeg_data.T
+        # Ensure correct shape (segments x samples x channels)
+        if eeg_segments.shape[1] < eeg_segments.shape[2]:
+            eeg_segments = eeg_segments.transpose(0, 2, 1)
         
         # Truncate to window length
         n_samples = int(self.window_length * self.fs)
-        if eeg_data.shape[0] > n_samples:
-            eeg_data = eeg_data[:n_samples, :]
-        elif eeg_data.shape[0] < n_samples:
+        if eeg_segments.shape[1] > n_samples:
+            eeg_segments = eeg_segments[:, :n_samples, :]
+        elif eeg_segments.shape[1] < n_samples:
             # Pad with zeros if too short
-            padding = n_samples - eeg_data.shape[0]
-            eeg_data = np.vstack([eeg_data, np.zeros((padding, eeg_data.shape[1]))])
-        
-        # Compute CCA for each frequency
-        for freq in self.frequencies:
-            try:
-                # Get reference signals
-                ref_signals = self.reference_signals[freq][:eeg_data.shape[0], :]
-                
-                # Perform CCA
-                cca = CCA(n_components=1, max_iter=500)
-                cca.fit(eeg_data, ref_signals)
-                
-                # Get canonical correlation coefficient
-                X_c, Y_c = cca.transform(eeg_data, ref_signals)
-                corr = np.corrcoef(X_c.T, Y_c.T)[0, 1]
-                
-                features[freq] = abs(corr)
-                
-            except Exception as e:
-                print(f"CCA error for {freq}Hz: {e}")
-                features[freq] = 0.0
-        
-        return features
+            padding = n_samples - eeg_segments.shape[1]
+            eeg_segments = np.concatenate(
+                [eeg_segments, np.zeros((n_segments, padding, eeg_segments.shape[2]))], axis=1)
+        
+        # Whiten every segment at once: orthonormal basis of the centered
+        # channels, with directions that carry no variance zeroed out
+        try:
+            u, s, _ = np.linalg.svd(eeg_segments - eeg_segments.mean(axis=1, keepdims=True),
+                                    full_matrices=False)
+            u *= (s > s[:, :1] * 1e-10)[:, np.newaxis, :]
+            projections = u.transpose(0, 2, 1) @ self.reference_bases
+        except Exception as e:
+            print(f"CCA error: {e}")
+            return features
+        
+        # The first canonical correlation is the largest singular value of the
+        # cross-product of the two orthonormal bases
+        n_refs = 2 * self.n_harmonics
+        for i in range(len(self.frequencies)):
+            block = projections[:, :, i * n_refs:(i + 1) * n_refs]
+            if block.size > 0:
+                features[:, i] = np.linalg.svd(block, compute_uv=False)[:, 0]
+        
+        return np.minimum(features, 1.0)
     
-    def _fbcca_features(self, eeg_data: np.ndarray) -> Dict[str, float]:
+    def _fbcca_features(self, eeg_segments: np.ndarray) -> np.ndarray:
         """
         Extract features using Filter Bank CCA
         
         Args:
-            eeg_data: EEG data (channels x samples)
+            eeg_segments: EEG data (segments x channels x samples)
             
         Returns:
-            FBCCA coefficients for each frequency
+            FBCCA coefficients (segments x frequencies)
         """
         if not self.use_filter_bank:
-            return self._cca_features(eeg_data)
+            return self._cca_features(eeg_segments)
         
-        features = {}
-        
-        # Initialize features
-        for freq in self.frequencies:
-            features[freq] = 0.0
+        features = np.zeros((len(eeg_segments), len(self.frequencies)))
         
         # Apply each filter and compute CCA
-        for fb_idx, sos_filter in enumerate(self.filter_bank):
+        for fb_idx in range(len(self.filter_bank)):
             # Filter the data
-            filtered_data = signal.sosfiltfilt(sos_filter, eeg_data, axis=1)
-            
-            # Get CCA features for filtered data
-            fb_features = self._cca_features(filtered_data)
+            filtered_data = self._apply_filter_bank(fb_idx, eeg_segments)
             
             # Weight by filter bank index (higher weight for lower frequencies)
             weight = (self.n_filters - fb_idx) / self.n_filters
             
-            # Accumulate weighted features
-            for freq in self.frequencies:
-                features[freq] += weight * fb_features.get(freq, 0)
+            # Accumulate weighted CCA features of the filtered data
+            features += weight * self._cca_features(filtered_data)
         
-        # Normalize
-        max_val = max(features.values()) if features else 1.0
-        if max_val > 0:
-            for freq in features:
-                features[freq] /= max_val
+        return self._normalize_rows(features)
+    
+    def _apply_filter_bank(self, fb_idx: int, eeg_data: np.ndarray) -> np.ndarray:
+        """
+        Filter EEG data through one filter bank sub-band
         
-        return features
+        Args:
+            fb_idx: Sub-band index
+            eeg_data: EEG data (... x channels x samples)
+            
+        Returns:
+            Sub-band filtered data
+        """
+        sos = self.filter_bank[fb_idx]
+        if not self.causal_filter_bank:
+            return signal.sosfiltfilt(sos, eeg_data, axis=-1)
+        
+        # Single causal pass, started from each channel's steady state at the
+        # first sample so the window edge doesn't ring. The phase lag is
+        # absorbed by the sine/cosine reference pairs.
+        zi_shape = (sos.shape[0],) + (1,) * (eeg_data.ndim - 1) + (2,)
+        zi = self.filter_bank_zi[fb_idx].reshape(zi_shape) * eeg_data[np.newaxis, ..., :1]
+        filtered_data, _ = signal.sosfilt(sos, eeg_data, axis=-1, zi=zi)
+        return filtered_data
     
-    def _psda_features(self, eeg_data: np.ndarray) -> Dict[str, float]:
+    def _psda_features(self, eeg_segments: np.ndarray) -> np.ndarray:
         """
         Extract features using Power Spectral Density Analysis
         
         Args:
-            eeg_data: EEG data (channels x samples)
+            eeg_segments: EEG data (segments x channels x samples)
             
         Returns:
-            PSDA features for each frequency
+            PSDA features (segments x frequencies)
         """
-        features = {}
+        n_samples = eeg_segments.shape[-1]
+        if self.psda_use_welch or n_samples < self.psda_nperseg:
+            # Full Welch PSD, averaged across channels (Welch clamps nperseg
+            # to the window length when the window is short)
+            nperseg = min(self.psda_nperseg, n_samples)
+            plan = self._psda_plan(nperseg)
+            _, psd = signal.welch(eeg_segments,
+                                  fs=self.fs,
+                                  nperseg=self.psda_nperseg,
+                                  noverlap=self.psda_noverlap,
+                                  axis=-1)
+            power = psd.mean(axis=1)[:, plan['bins']]
+        else:
+            plan = self._psda_plan(self.psda_nperseg)
+            power = self._psda_targeted_power(eeg_segments, plan)
         
-        # Compute PSD using Welch's method
-        nperseg = self.config['FEATURES']['psda']['nperseg']
-        noverlap = self.config['FEATURES']['psda']['noverlap']
+        # Sum power in a small window around each target frequency and harmonic
+        features = np.stack([power[:, plan['positions'][freq]].sum(axis=1)
+                             for freq in self.frequencies], axis=1)
         
-        # Average PSD across channels
-        psd_list = []
-        for ch in range(eeg_data.shape[0]):
-            f, psd = signal.welch(eeg_data[ch, :], 
-                                 fs=self.fs,
-                                 nperseg=nperseg,
-                                 noverlap=noverlap)
-            psd_list.append(psd)
+        return self._normalize_rows(features)
+    
+    @staticmethod
+    def _normalize_rows(features: np.ndarray) -> np.ndarray:
+        """
+        Scale each segment's features by its largest feature
         
-        # Average across channels
-        psd_avg = np.mean(psd_list, axis=0)
+        Args:
+            features: Feature array (segments x frequencies)
+            
+        Returns:
+            Normalized features (rows whose maximum is not positive are left as is)
+        """
+        max_vals = features.max(axis=1, keepdims=True)
+        return np.divide(features, max_vals, out=features, where=max_vals > 0)
+    
+    def _psda_plan(self, nperseg: int) -> Dict[str, Any]:
+        """
+        Get the Welch bins PSDA reads and the DFT basis that evaluates them
         
-        # Extract power at target frequencies and harmonics
-        for freq in self.frequencies:
-            power = 0.0
+        Args:
+            nperseg: Welch segment length
             
-            for harmonic in range(1, self.n_harmonics + 1):
-                target_freq = freq * harmonic
-                
-                # Find closest frequency bin
-                freq_idx = np.argmin(np.abs(f - target_freq))
-                
-                # Sum power in a small window around target frequency
-                window_size = 0.5  # Hz
-                freq_range = np.where((f >= target_freq - window_size) & 
-                                     (f <= target_freq + window_size))[0]
-                
-                if len(freq_range) > 0:
-                    power += np.sum(psd_avg[freq_range])
+        Returns:
+            Dictionary with the distinct bins read, each frequency's positions
+            into them (one ±0.5 Hz band per harmonic), the Hann-windowed DFT
+            basis and Goertzel coefficients for those bins and their one-sided
+            density scale
+        """
+        plan = self._psda_plans.get(nperseg)
+        if plan is None:
+            f = np.fft.rfftfreq(nperseg, 1.0 / self.fs)
+            window_size = 0.5  # Hz
+            bands = {}
+            for freq in self.frequencies:
+                freq_bands = []
+                for harmonic in range(1, self.n_harmonics + 1):
+                    target_freq = freq * harmonic
+                    freq_bands.append(np.flatnonzero((f >= target_freq - window_size) &
+                                                     (f <= target_freq + window_size)))
+                bands[freq] = np.concatenate(freq_bands)
+            
+            bins = np.unique(np.concatenate(list(bands.values())))
+            positions = {freq: np.searchsorted(bins, idx) for freq, idx in bands.items()}
             
-            features[freq] = power
+            # Same window and density scaling as signal.welch
+            window = signal.get_window('hann', nperseg)
+            scale = np.full(len(bins), 2.0 / (self.fs * np.sum(window ** 2)))
+            scale[bins == 0] /= 2
+            if nperseg % 2 == 0:
+                scale[bins == nperseg // 2] /= 2
+            
+            n = np.arange(nperseg)
+            basis = window[:, None] * np.exp(-2j * np.pi * np.outer(n, bins) / nperseg)
+            coeffs = 2 * np.cos(2 * np.pi * bins / nperseg)
+            
+            plan = {'bins': bins, 'positions': positions, 'basis': basis,
+                    'window': window, 'coeffs': coeffs, 'scale': scale}
+            self._psda_plans[nperseg] = plan
         
-        # Normalize features
-        max_power = max(features.values()) if features else 1.0
-        if max_power > 0:
-            for freq in features:
-                features[freq] /= max_power
+        return plan
+    
+    def _psda_targeted_power(self, eeg_segments: np.ndarray, plan: Dict[str, Any]) -> np.ndarray:
+        """
+        Welch PSD evaluated only at the bins PSDA reads, averaged across channels
         
-        return features
+        Args:
+            eeg_segments: EEG data (segments x channels x samples)
+            plan: Bin plan from _psda_plan
+            
+        Returns:
+            Channel-averaged power at each bin in plan['bins'] (segments x bins)
+        """
+        step = self.psda_nperseg - self.psda_noverlap
+        if NUMBA_AVAILABLE:
+            power = np.empty((len(eeg_segments), len(plan['bins'])))
+            # float32 EEG is read as-is; the recurrence accumulates in float64
+            data = np.ascontiguousarray(eeg_segments,
+                                        dtype=np.result_type(eeg_segments.dtype, np.float32))
+            for i in range(len(data)):
+                _goertzel_power(data[i], self.psda_nperseg, step, plan['window'], plan['coeffs'], power[i])
+            return power * plan['scale']
+        
+        # Overlapping, mean-removed windows exactly as Welch would cut them
+        windows = sliding_window_view(eeg_segments, self.psda_nperseg, axis=-1)[..., ::step, :]
+        windows = windows - windows.mean(axis=-1, keepdims=True)
+        
+        # Single-bin DFTs (what Goertzel computes) for just the target bins
+        spectrum = windows @ plan['basis']
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        
+        return power.mean(axis=(1, 2)) * plan['scale']
     
     def train(self, training_data: Dict[float, np.ndarray]):
         """
         Train classifier with calibration data
         
+        PSDA/MSI trials of one frequency are scored in a single batch when they
+        all have the same shape; trials of differing lengths are scored one by one.
+        
         Args:
             training_data: Dictionary mapping frequencies to EEG data arrays
         """
@@ -272,25 +439,21 @@ class SSVEPClassifier:
             if freq not in self.frequencies:
                 continue
             
-            # Compute average template for each frequency
-            templates = []
-            
-            for eeg_data in data_list:
-                # Extract features or store raw template
-                if self.method in ['CCA', 'FBCCA']:
-                    # Store preprocessed data as template
-                    templates.append(eeg_data)
-                else:
-                    # Store feature vector as template
-                    features = self.extract_features(eeg_data)
-                    templates.append(features[freq])
+            if len(data_list) == 0:
+                continue
             
-            # Average templates
-            if templates:
-                if isinstance(templates[0], np.ndarray):
-                    self.templates[freq] = np.mean(templates, axis=0)
+            if self.method in ['CCA', 'FBCCA']:
+                # Store averaged preprocessed data as template
+                self.templates[freq] = np.mean(data_list, axis=0)
+            else:
+                # Score all trials in one batched call (if they can be
+                # stacked) and average this frequency's feature
+                if len({np.shape(trial) for trial in data_list}) == 1:
+                    features = self.extract_features_batch(np.stack(data_list))
                 else:
-                    self.templates[freq] = np.mean(templates)
+                    features = np.concatenate([self.extract_features_batch(trial[np.newaxis])
+                                               for trial in data_list])
+                self.templates[freq] = np.mean(features[:, self.frequencies.index(freq)])
         
         self.trained = True
         print(f"Trained SSVEP classifier with {len(self.templates)} frequency templates")
@@ -5,11 +5,30 @@ Signal preprocessing optimized for SSVEP detection
 
 import numpy as np
 from scipy import signal
+from functools import lru_cache
 from typing import Tuple, Optional, Dict, Any
 import mne
 from mne.preprocessing import ICA
 
 
+@lru_cache(maxsize=64)
+def _butter_sos(order: int, low: float, high: float, fs: float, btype: str) -> np.ndarray:
+    """
+    Design a Butterworth filter, shared across preprocessor instances
+    
+    Args:
+        order: Filter order
+        low: Low cutoff frequency (Hz)
+        high: High cutoff frequency (Hz)
+        fs: Sampling frequency (Hz)
+        btype: Filter type ('band' or 'bandstop')
+        
+    Returns:
+        Second-order sections (shared by every caller; do not modify in place)
+    """
+    return signal.butter(order, [low, high], btype=btype, fs=fs, output='sos')
+
+
 class SSVEPPreprocessor:
     """
     Preprocessing pipeline for SSVEP signals
@@ -47,16 +66,19 @@ class SSVEPPreprocessor:
     def _create_filters(self):
         """Create filter coefficients"""
         # Bandpass filter
-        self.bp_sos = signal.butter(4, self.bandpass, 
-                                   btype='band', 
-                                   fs=self.fs, 
-                                   output='sos')
+        self.bp_sos = _butter_sos(4, self.bandpass[0], self.bandpass[1], self.fs, 'band')
         
         # Notch filter
         self.notch_b, self.notch_a = signal.iirnotch(self.notch_freq, 
                                                      self.notch_freq/self.notch_width, 
                                                      self.fs)
         
+        # Causal notch + bandpass cascade for streaming, with the unit-step
+        # initial state; the per-channel state is set on the first chunk
+        self.stream_sos = np.vstack([signal.tf2sos(self.notch_b, self.notch_a), self.bp_sos])
+        self._stream_zi = signal.sosfilt_zi(self.stream_sos)
+        self._stream_state = None
+        
         # Optional: Create filters for each SSVEP frequency band
         self.freq_filters = {}
         for freq in self.config['STIMULUS']['frequencies']:
@@ -68,11 +90,7 @@ class SSVEPPreprocessor:
                 f_high = f_center + 1.0
                 
                 if f_high < self.fs / 2:  # Below Nyquist
-                    sos = signal.butter(3, [f_low, f_high], 
-                                      btype='band', 
-                                      fs=self.fs, 
-                                      output='sos')
-                    filters.append(sos)
+                    filters.append(_butter_sos(3, f_low, f_high, self.fs, 'band'))
             
             self.freq_filters[freq] = filters
     
@@ -117,6 +135,38 @@ class SSVEPPreprocessor:
         
         return eeg_data
     
+    def filter_chunk(self, eeg_chunk: np.ndarray) -> np.ndarray:
+        """
+        Notch and bandpass filter newly acquired samples only
+        
+        The filter state carries over between calls, so a window assembled
+        from consecutive filtered chunks needs no further notch or bandpass
+        filtering (pass apply_notch=False, apply_bandpass=False to process).
+        Unlike the zero-phase filters this is causal.
+        
+        Args:
+            eeg_chunk: New EEG samples (channels x samples), in stream order
+            
+        Returns:
+            Filtered samples
+        """
+        if eeg_chunk.ndim == 1:
+            eeg_chunk = eeg_chunk.reshape(1, -1)
+        if eeg_chunk.shape[1] == 0:
+            return eeg_chunk
+        
+        if self._stream_state is None or self._stream_state.shape[1] != eeg_chunk.shape[0]:
+            # Start in steady state for each channel's first sample
+            self._stream_state = self._stream_zi[:, None, :] * eeg_chunk[None, :, :1]
+        
+        filtered, self._stream_state = signal.sosfilt(self.stream_sos, eeg_chunk, axis=1,
+                                                      zi=self._stream_state)
+        return filtered
+    
+    def reset_stream(self):
+        """Forget the streaming filter state, e.g. before a new recording"""
+        self._stream_state = None
+    
     def apply_bandpass_filter(self, eeg_data: np.ndarray) -> np.ndarray:
         """
         Apply bandpass filter
@@ -59,6 +59,9 @@ class SSVEPStimulus:
         self.screen = None
         self.font = None
         self.small_font = None
+        
+        # Rendered readout text, keyed by (font, text, color)
+        self._text_cache = {}
         self.clock = pygame.time.Clock()
         
         # Target positions and properties
@@ -67,9 +70,11 @@ class SSVEPStimulus:
         self.target_surfaces = {}
         self.flickering_surfaces = {}
         
-        # Phase tracking for each frequency
-        self.phases = {freq: 0.0 for freq in self.frequencies}
-        self.last_update_time = time.time()
+        # Phase tracking for each frequency, driven by the displayed frame count
+        # (one ndarray lane per target, updated with a single vector op)
+        self._freq_steps = np.asarray(self.frequencies, dtype=np.float64) / self.refresh_rate
+        self.phases = np.zeros(len(self.frequencies))
+        self.frame_index = 0
         
         # Control flags
         self.running = False
@@ -112,9 +117,10 @@ class SSVEPStimulus:
             
             pygame.display.set_caption("SSVEP BCI System")
             
-            # Initialize fonts
+            # Initialize fonts (surfaces rendered with the old ones are stale)
             self.font = pygame.font.Font(None, self.font_size)
             self.small_font = pygame.font.Font(None, 24)
+            self._text_cache = {}
             
             # Calculate target positions
             self._calculate_target_positions()
@@ -304,9 +310,7 @@ class SSVEPStimulus:
         
         if self.stimulating and (self.current_target is None or self.current_target == target_idx):
             # Calculate current phase for this frequency
-            frequency = self.frequencies[target_idx]
-            current_time = time.time()
-            phase = self.phases[frequency]
+            phase = self.phases[target_idx]
             
             # Determine visibility based on stimulus type
             if self.stimulus_type == 'sinusoidal':
@@ -363,7 +367,7 @@ class SSVEPStimulus:
         
         # Display FPS
         fps_text = f"FPS: {actual_fps:.1f} / {self.refresh_rate}"
-        fps_surface = self.small_font.render(fps_text, True, (150, 150, 150))
+        fps_surface = self._render_text(self.small_font, fps_text, (150, 150, 150))
         self.screen.blit(fps_surface, (10, 10))
         
         # Display frequency accuracy
@@ -374,23 +378,42 @@ class SSVEPStimulus:
             
             freq_text = f"F{idx+1}: {actual_freq:.2f}Hz ({accuracy:.1f}%)"
             color = (0, 255, 0) if accuracy > 95 else (255, 255, 0) if accuracy > 90 else (255, 0, 0)
-            freq_surface = self.small_font.render(freq_text, True, color)
+            freq_surface = self._render_text(self.small_font, freq_text, color)
             self.screen.blit(freq_surface, (10, y_offset))
             y_offset += 25
     
-    def update_phases(self):
-        """Update phase values for each frequency"""
-        current_time = time.time()
-        dt = current_time - self.last_update_time
-        
-        for freq in self.frequencies:
-            # Update phase based on elapsed time
-            self.phases[freq] += freq * dt
-            # Keep phase in [0, 1] range
-            self.phases[freq] = self.phases[freq] % 1.0
+    def _render_text(self, font: pygame.font.Font, text: str, color: Tuple) -> pygame.Surface:
+        """
+        Render text once and reuse the surface on later frames
         
-        self.last_update_time = current_time
-        self.frame_times.append(current_time)
+        Args:
+            font: Font to render with
+            text: Text to render
+            color: RGB text color
+            
+        Returns:
+            Rendered text surface
+        """
+        key = (font, text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            # The FPS readout keeps producing new strings
+            if len(self._text_cache) >= 512:
+                self._text_cache.clear()
+            surface = font.render(text, True, color)
+            self._text_cache[key] = surface
+        return surface
+    
+    def update_phases(self):
+        """Update phase values for each frequency from the frame counter"""
+        # Phase of frame i is f * i / refresh_rate, so flicker edges stay
+        # locked to display refreshes and stimulus trains are reproducible
+        frame = self.frame_index
+        np.multiply(self._freq_steps, frame, out=self.phases)
+        np.mod(self.phases, 1.0, out=self.phases)
+        
+        self.frame_index = frame + 1
+        self.frame_times.append(time.time())
     
     def start_stimulation(self, target_idx: Optional[int] = None):
         """
@@ -401,11 +424,10 @@ class SSVEPStimulus:
         """
         self.stimulating = True
         self.current_target = target_idx
-        self.last_update_time = time.time()
         
         # Reset phases
-        for freq in self.frequencies:
-            self.phases[freq] = 0.0
+        self.frame_index = 0
+        self.phases.fill(0.0)
         
         # Send marker
         if self.marker_callback: